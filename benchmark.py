@@ -0,0 +1,425 @@
+"""
+本地基准测试（不访问网络）：
+    python benchmark.py            运行全部
+    python benchmark.py adapters   只运行指定项
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import main as app
+from eventlog import EventLog
+from history import DOWNSAMPLERS
+from publish import run_git, publish_files, publish_data_branch, append_text_delta
+from profiling import importtime_summary
+from changeset import ChangeSetWriter
+from freshness import FreshnessTracker
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def timeit(func, repeat):
+    """返回 (结果, 平均耗时ms)"""
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+# ------------------------------
+# 数据源适配器：fetch + parse + normalise
+# ------------------------------
+def bench_adapters(repeat=50):
+    adapters = [
+        app.RmtcHtmlAdapter("rmtc", {"url": str(FIXTURE_DIR / "rmtc_listtype0M.html")}),
+        app.JsonApiAdapter("json", {
+            "url": str(FIXTURE_DIR / "sample_api.json"),
+            "records_path": "data.items",
+            "field_map": "省份:province, 监测点:station, 辐射值:dose, 更新时间:updated",
+            "value_unit": "nGy/h",
+        }),
+        app.CsvAdapter("csv", {
+            "url": str(FIXTURE_DIR / "sample_dump.csv"),
+            "field_map": "监测点:station, 辐射值:dose, 更新时间:updated",
+        }),
+    ]
+    baseline = None
+    for adapter in adapters:
+        records, cost = timeit(lambda: adapter.crawl(0, 0), repeat)
+        rows = [{k: r[k] for k in app.RECORD_FIELDS[:-1]} for r in records]
+        baseline = rows if baseline is None else baseline
+        status = "一致" if rows == baseline else "与rmtc结果不一致"
+        print(f"[adapters] {adapter.name:<6} {len(records):>4}条  {cost:8.2f} ms/次  {status}")
+
+
+# ------------------------------
+# 事件日志：写入成本不随日志总量增长
+# ------------------------------
+def bench_eventlog(batches=(1000, 10000, 100000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EventLog(Path(tmp) / "events.db")
+        written = 0
+        for target in batches:
+            while written < target - 100:
+                log.append(f"填充事件 {written}", task_type="定时")
+                written += 1
+            _, cost = timeit(lambda: log.append("基准事件", level="错误", task_type="手动"), 100)
+            written += 100
+            total = log.count()
+            _, tail_cost = timeit(lambda: log.page(total - 40, 40, total=total), 20)
+            print(f"[eventlog] {written:>7}条  写入 {cost:6.3f} ms/条  读取末页 {tail_cost:6.3f} ms")
+        log.close()
+
+
+# ------------------------------
+# 历史曲线：多年数据降采样到画布宽度
+# ------------------------------
+def bench_downsample(width=800):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    for years, per_day in ((1, 24), (10, 24), (10, 1440)):
+        n = years * 365 * per_day
+        x = np.arange(n, dtype="int64") * (86400 // per_day)
+        y = 80 + np.cumsum(rng.normal(0, 0.5, n))
+        for name, func in DOWNSAMPLERS.items():
+            (dx, _), cost = timeit(lambda: func(x, y, width), 3)
+            print(f"[downsample] {years:>2}年×{per_day:>4}点/天 {n:>9}点 → {name:<6} {len(dx):>4}点  {cost:7.1f} ms")
+
+
+# ------------------------------
+# Git发布布局：模拟一年抓取推送到本地裸仓库
+# ------------------------------
+def _dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def bench_publish(days=365):
+    import random
+    import shutil
+    import datetime
+    import pandas as pd
+
+    base = app.RmtcHtmlAdapter("rmtc", {"url": str(FIXTURE_DIR / "rmtc_listtype0M.html")}).crawl(0, 0)
+    rng = random.Random(0)
+    doses = {r["监测点"]: int(r["辐射值"].split()[0]) for r in base}
+    start_day = datetime.datetime(2025, 1, 1, 10, 0, 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # 预先生成一年的快照，三种布局使用同一批数据
+        snapshots = []
+        (tmp / "snapshots").mkdir()
+        for day in range(days):
+            crawl_time = start_day + datetime.timedelta(days=day)
+            records = []
+            for r in base:
+                doses[r["监测点"]] = max(30, doses[r["监测点"]] + rng.randint(-3, 3))
+                records.append(dict(r, 辐射值=f"{doses[r['监测点']]} nGy/h", 更新时间=crawl_time.strftime('%Y-%m-%d')))
+            path = tmp / "snapshots" / f"辐射监测数据_{crawl_time.strftime('%Y%m%d_%H%M%S')}.xlsx"
+            pd.DataFrame(records).to_excel(path, index=False, sheet_name="辐射数据")
+            snapshots.append((crawl_time, path, records))
+
+        for layout in ("main", "data_branch", "text"):
+            remote, work = tmp / f"{layout}.git", tmp / layout
+            run_git(["init", "-q", "--bare", str(remote)])
+            run_git(["init", "-q", "-b", "main", str(work)])
+            for args in (["config", "user.name", "bench"], ["config", "user.email", "bench@localhost"],
+                         ["remote", "add", "origin", str(remote)]):
+                run_git(args, work)
+            (work / "data").mkdir()
+            push_costs = []
+            for crawl_time, snapshot, records in snapshots:
+                file_path = work / "data" / snapshot.name
+                shutil.copy(snapshot, file_path)
+                message = f"自动更新：{crawl_time}"
+                start = time.perf_counter()
+                if layout == "data_branch":
+                    delta = append_text_delta(records, work / "history", crawl_time=crawl_time)
+                    ok = publish_data_branch(file_path, message, repo_dir=work, text_file=delta)
+                elif layout == "text":
+                    delta = append_text_delta(records, work / "history", crawl_time=crawl_time)
+                    ok = publish_files([delta.relative_to(work)], message, repo_dir=work)
+                else:
+                    ok = publish_files([file_path.relative_to(work)], message, repo_dir=work)
+                push_costs.append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    print(f"[publish] {layout} 第{len(push_costs)}次发布失败")
+                    break
+            raw_size = _dir_size(remote)
+            run_git(["gc", "-q", "--prune=now"], remote)
+            start = time.perf_counter()
+            run_git(["clone", "-q", "--no-checkout", str(remote), str(tmp / f"{layout}-clone")])
+            clone_cost = (time.perf_counter() - start) * 1000
+            tail = push_costs[-30:]
+            print(f"[publish] {layout:<11} 发布{len(push_costs)}次  末30次 {sum(tail) / len(tail):7.1f} ms/次  "
+                  f"远程 {raw_size / 1024:8.0f} KB（gc后 {_dir_size(remote) / 1024:6.0f} KB）  克隆 {clone_cost:6.0f} ms")
+
+
+# ------------------------------
+# 冷启动：首帧绘制耗时（无图形环境时只统计导入耗时）
+# ------------------------------
+def bench_startup(repeat=5):
+    import re
+    import statistics
+    import subprocess
+
+    script = Path(__file__).resolve().parent / "main.py"
+    paint, imports = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {str(script.parent)!r}); import main"],
+                           cwd=tmp, capture_output=True)
+            imports.append((time.perf_counter() - start) * 1000)
+            result = subprocess.run([sys.executable, str(script), "--profile-startup"],
+                                    cwd=tmp, capture_output=True, text=True)
+            match = re.search(r"首帧绘制.*累计\s+([\d.]+) ms", result.stdout)
+            if match:
+                paint.append(float(match.group(1)))
+    print(f"[startup] 进程启动+import main  中位数 {statistics.median(imports):7.1f} ms")
+    if paint:
+        print(f"[startup] 首帧绘制（进程内）      中位数 {statistics.median(paint):7.1f} ms")
+    else:
+        print("[startup] 无图形环境，未统计首帧绘制")
+    total, rows = importtime_summary("main")
+    print(f"[startup] -X importtime: import main {total:.1f} ms；"
+          + "，".join(f"{name} {cost:.1f}" for name, cost in rows[:5]))
+
+
+# ------------------------------
+# 快照差异：整批比对 + 变更记录大小
+# ------------------------------
+def bench_changeset(sizes=(31, 10000, 100000)):
+    import os
+    import random
+
+    rng = random.Random(0)
+    for n in sizes:
+        old = [{"省份": f"省{i % 31}", "监测点": f"省{i % 31} (站{i})", "辐射值": f"{rng.randint(50, 150)} nGy/h",
+                "更新时间": "2025-10-15"} for i in range(n)]
+        new = [dict(r, 辐射值=f"{int(r['辐射值'].split()[0]) + 1} nGy/h") if rng.random() < 0.05 else r
+               for r in old[n // 100:]]
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ChangeSetWriter(Path(tmp) / "changes.jsonl")
+            writer.apply(old, "old.xlsx")
+            size_before = os.path.getsize(writer.changes_path)
+            start = time.perf_counter()
+            change = writer.apply(new, "new.xlsx")
+            cost = (time.perf_counter() - start) * 1000
+            delta_size = os.path.getsize(writer.changes_path) - size_before
+        print(f"[changeset] {n:>6}站  比对 {cost:7.1f} ms  删除{len(change['removed'])} 变化{len(change['changed'])}  "
+              f"变更记录 {delta_size / 1024:7.1f} KB")
+
+
+# ------------------------------
+# 自适应轮询：模拟源站每天在发布时间附近随机发布，对比固定时刻抓取
+# ------------------------------
+def bench_freshness(days=60, crawl_time="10:00"):
+    import random
+    import datetime
+
+    rng = random.Random(0)
+    start = datetime.datetime(2025, 1, 1)
+    publish = [start + datetime.timedelta(days=d, hours=10, minutes=30 + rng.randint(-40, 40)) for d in range(days + 1)]
+
+    def page(now):
+        latest = max(d for d in range(days + 1) if publish[d] <= now) if now >= publish[0] else -1
+        date = (start + datetime.timedelta(days=latest - 1)).date().isoformat()
+        return [{"监测点": f"站{i}", "更新时间": date} for i in range(31)]
+
+    def simulate(next_poll, on_poll):
+        now, polls, seen, latency = start, 0, -1, []
+        end = start + datetime.timedelta(days=days)
+        while now < end:
+            polls += 1
+            records = page(now)
+            on_poll(records, now)
+            day = (datetime.date.fromisoformat(records[0]["更新时间"]) - start.date()).days + 1
+            if day > seen and day >= 0:
+                latency.append((now - publish[day]).total_seconds() / 60)
+                seen = day
+            now = next_poll(now)
+        return polls, sum(latency) / len(latency)
+
+    hour, minute = map(int, crawl_time.split(":"))
+
+    def fixed_next(now):
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return target if target > now else target + datetime.timedelta(days=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracker = FreshnessTracker(Path(tmp) / "freshness.json", publish_time=crawl_time)
+        results = {
+            "固定时刻": simulate(fixed_next, lambda records, now: None),
+            "每10分钟": simulate(lambda now: now + datetime.timedelta(minutes=10), lambda records, now: None),
+            "自适应": simulate(tracker.next_poll, lambda records, now: tracker.update(records, now)),
+        }
+    for name, (polls, latency) in results.items():
+        print(f"[freshness] {name:<5} {days}天 请求{polls:>4}次  发布到抓取平均延迟 {latency:7.1f} 分钟")
+
+
+# ------------------------------
+# 空间索引：最近邻/矩形查询，与暴力计算结果核对
+# ------------------------------
+def bench_geo(sizes=(31, 10000, 100000), queries=200):
+    import random
+    import numpy as np
+    from geo import StationIndex, unit_vectors
+
+    rng = random.Random(0)
+    for n in sizes:
+        stations = [{"监测点": f"站{i}", "省份": f"省{i % 31}", "纬度": rng.uniform(18, 53), "经度": rng.uniform(73, 135)}
+                    for i in range(n)]
+        start = time.perf_counter()
+        index = StationIndex(stations)
+        build = (time.perf_counter() - start) * 1000
+        points = [(rng.uniform(18, 53), rng.uniform(73, 135)) for _ in range(queries)]
+        vectors = unit_vectors(index.lat, index.lon)
+
+        results, cost = timeit(lambda: [index.nearest(lat, lon, 5)[0] for lat, lon in points], 1)
+        brute, brute_cost = timeit(lambda: [np.argsort(((vectors - unit_vectors([lat], [lon])[0]) ** 2).sum(axis=1))[:5]
+                                            for lat, lon in points], 1)
+        same = all(a.tolist() == b.tolist() for a, b in zip(results, brute))
+        _, bbox_cost = timeit(lambda: [index.in_bbox(lat - 1, lon - 1, lat + 1, lon + 1) for lat, lon in points], 1)
+        print(f"[geo] {n:>6}站  建树 {build:8.1f} ms  最近5个 {cost * 1000 / queries:7.1f} us/次"
+              f"（暴力 {brute_cost * 1000 / queries:8.1f} us，{'一致' if same else '不一致'}）"
+              f"  2°矩形 {bbox_cost * 1000 / queries:7.1f} us/次")
+
+
+# ------------------------------
+# 时间序列存储：体积对比Parquet，按时间范围查询
+# ------------------------------
+def bench_tsstore(days=730, stations=(31, 1000)):
+    # 两种读数变化：每天在±2内均匀随机游走（熵较高），以及80%的天数不变、其余±1
+    profiles = {"游走±2": ([-2, -1, 0, 1, 2], None), "慢变": ([-1, 0, 1], [0.1, 0.8, 0.1])}
+    for profile, (steps, weights) in profiles.items():
+        for n in stations:
+            _bench_tsstore_case(profile, steps, weights, days, n)
+
+
+def _bench_tsstore_case(profile, steps, weights, days, n):
+    import os
+    import datetime
+    import numpy as np
+    import pandas as pd
+    from tsstore import TimeSeriesStore
+
+    rng = np.random.default_rng(0)
+    start = datetime.datetime(2024, 1, 1, 10)
+    names = [f"省{i % 31} (站{i})" for i in range(n)]
+    base = rng.integers(50, 150, n)
+    doses = base + np.cumsum(rng.choice(steps, (days, n), p=weights), axis=0).clip(-20, 20)
+    stamps = [start + datetime.timedelta(days=d, seconds=int(rng.integers(0, 90))) for d in range(days)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TimeSeriesStore(Path(tmp) / "ts")
+        t0 = time.perf_counter()
+        for d, stamp in enumerate(stamps):
+            update = (stamp - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+            store.append([{"省份": name.split(" (")[0], "监测点": name, "剂量": float(doses[d, i]), "更新时间": update}
+                          for i, name in enumerate(names)], stamp)
+        store.flush()
+        write = (time.perf_counter() - t0) * 1000
+        size = store.stats()["bytes"]
+
+        frame = pd.DataFrame({
+            "采集时间": np.repeat(pd.to_datetime(stamps), n), "省份": [nm.split(" (")[0] for nm in names] * days,
+            "监测点": names * days, "辐射值": [f"{v} nGy/h" for v in doses.ravel()],
+            "剂量": doses.ravel().astype(float),
+            "更新时间": np.repeat([(s - datetime.timedelta(days=1)).strftime("%Y-%m-%d") for s in stamps], n)})
+        sizes = {}
+        for codec in ("snappy", "zstd"):
+            path = Path(tmp) / f"history_{codec}.parquet"
+            frame.to_parquet(path, compression=codec, index=False)
+            sizes[codec] = os.path.getsize(path)
+
+        reopened = TimeSeriesStore(Path(tmp) / "ts")
+        a, b = stamps[days // 2], stamps[days // 2 + 30]
+        (t, v, _), query = timeit(lambda: reopened.range(names[n // 2], a, b), 200)
+        same = np.array_equal(v, doses[days // 2:days // 2 + 31, n // 2])
+    points = days * n
+    print(f"[tsstore] {profile:<4} {n:>5}站x{days}天  写入 {write / days:6.2f} ms/次  {size / 1024:8.1f} KB（{size / points:5.2f} 字节/点）  "
+          f"Parquet snappy {sizes['snappy'] / size:5.1f}倍 zstd {sizes['zstd'] / size:5.1f}倍  "
+          f"31天范围查询 {query * 1000:6.1f} us {'一致' if same else '不一致'}")
+
+
+# ------------------------------
+# 数据质量校验：整批向量化，每行耗时应随批次增大保持平稳
+# ------------------------------
+def bench_quality(sizes=(31, 10000, 100000), repeat=5):
+    import random
+    from quality import validate
+
+    rng = random.Random(0)
+    bad_values = ["-5 nGy/h", "数值缺失", "80 mSv/h", "abc"]
+    bad_times = ["时间缺失", "2099-01-01", "昨天"]
+    validate([])  # 预热：首次调用时导入pandas
+    for n in sizes:
+        names = [f"省{i % 31} (站{i})" for i in range(n)]
+        records = []
+        for i, name in enumerate(names):
+            record = {"省份": f"省{i % 31}", "监测点": name, "辐射值": f"{rng.randint(50, 150)} nGy/h",
+                      "更新时间": "2025-10-15", "来源": "rmtc"}
+            roll = rng.random()
+            if roll < 0.01:
+                record["辐射值"] = rng.choice(bad_values)
+            elif roll < 0.02:
+                record["更新时间"] = rng.choice(bad_times)
+            elif roll < 0.03:
+                record["监测点"] = rng.choice(names)
+            records.append(record)
+        (passed, quarantined, metrics), cost = timeit(lambda: validate(records, set(names[:-n // 100 or None])), repeat)
+        print(f"[quality] {n:>6}行  {cost:8.2f} ms/批  {cost * 1000 / n:6.2f} us/行  "
+              f"通过{len(passed)} 隔离{len(quarantined)}  {metrics['rules']}")
+
+
+# ------------------------------
+# 最新状态缓存：快照加载（启动路径）、写时复制更新、无锁读取
+# ------------------------------
+def bench_latest(sizes=(31, 10000, 100000), repeat=5):
+    from latest import LatestState
+
+    for n in sizes:
+        records = [{"省份": f"省{i % 31}", "监测点": f"省{i % 31} (站{i})", "辐射值": f"{50 + i % 100} nGy/h",
+                    "更新时间": "2025-10-15", "来源": "rmtc"} for i in range(n)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "latest.pkl"
+            state = LatestState(path)
+            _, update = timeit(lambda: state.update(records), repeat)
+            _, load = timeit(lambda: LatestState(path), repeat)
+            size = path.stat().st_size
+            view = state.view
+            names = list(view.index)[:1000]
+            _, get = timeit(lambda: [state.view.get(name) for name in names], repeat)
+            _, province = timeit(lambda: [state.view.in_province(f"省{i}") for i in range(31)], repeat)
+        print(f"[latest] {n:>6}站  快照 {size / 1024:8.1f} KB  加载 {load:7.2f} ms  更新 {update:7.2f} ms  "
+              f"按站读取 {get * 1000 / len(names):5.2f} us/次  按省读取 {province * 1000 / 31:8.1f} us/次")
+
+
+BENCHMARKS = {
+    "adapters": bench_adapters,
+    "eventlog": bench_eventlog,
+    "downsample": bench_downsample,
+    "publish": bench_publish,
+    "startup": bench_startup,
+    "changeset": bench_changeset,
+    "freshness": bench_freshness,
+    "geo": bench_geo,
+    "tsstore": bench_tsstore,
+    "quality": bench_quality,
+    "latest": bench_latest,
+}
+
+
+def run(names=None):
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"未知基准项：{name}（可选：{', '.join(BENCHMARKS)}）")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,122 @@
+"""
+快照差异：内存中保留上一次快照（按监测点索引），每次抓取后一次性计算
+新增/删除/变化的监测点及剂量差值，追加一行变更记录到JSONL，供下游增量读取。
+"""
+import json
+import datetime
+import threading
+from pathlib import Path
+
+from history import DOSE_PATTERN, list_snapshots
+
+SNAPSHOT_COLUMNS = ["监测点", "省份", "辐射值", "更新时间", "剂量"]
+
+
+def to_frame(records):
+    """记录列表 -> 以监测点为索引的DataFrame，附加数值剂量列；同一批内重复的监测点保留最后一条"""
+    import pandas as pd
+
+    df = pd.DataFrame(list(records or []))
+    for column in SNAPSHOT_COLUMNS[:-1]:
+        if column not in df:
+            df[column] = ""
+    df = df[SNAPSHOT_COLUMNS[:-1]].astype(str)
+    df["剂量"] = pd.to_numeric(df["辐射值"].str.extract(DOSE_PATTERN)[0], errors="coerce")
+    return df.drop_duplicates("监测点", keep="last").set_index("监测点")
+
+
+def diff_frames(old, new):
+    """返回 (新增, 删除, 变化) 三个DataFrame；变化指辐射值或更新时间不同，附带剂量差值"""
+    joined = old.join(new, how="outer", lsuffix="_旧", rsuffix="_新")
+    in_old = joined["辐射值_旧"].notna()
+    in_new = joined["辐射值_新"].notna()
+    both = in_old & in_new
+    changed_mask = both & ((joined["辐射值_旧"] != joined["辐射值_新"])
+                           | (joined["更新时间_旧"] != joined["更新时间_新"]))
+    joined["差值"] = joined["剂量_新"] - joined["剂量_旧"]
+    return joined[in_new & ~in_old], joined[in_old & ~in_new], joined[changed_mask]
+
+
+def _records(frame, columns):
+    """按列批量转换为记录列表（列名映射为输出字段名），NaN剂量输出为null"""
+    out = frame[list(columns)].rename(columns=columns)
+    for column in ("剂量", "差值"):
+        if column in out:
+            out[column] = out[column].round(3).astype(object).where(out[column].notna(), None)
+    out.insert(0, "监测点", out.index)
+    return out.to_dict("records")
+
+
+class ChangeSetWriter:
+    """持有上一次快照，apply()计算差异并写出变更记录"""
+
+    def __init__(self, changes_path, data_dir=None, file_prefix="辐射监测数据"):
+        self.changes_path = Path(changes_path)
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.file_prefix = file_prefix
+        self._lock = threading.Lock()
+        self._last = None
+        self._last_name = None
+
+    def _newest(self, exclude=""):
+        """data/中最新的快照（不含本次刚保存的）"""
+        if self.data_dir is None:
+            return None
+        snapshots = [p for p in list_snapshots(self.data_dir, self.file_prefix) if p.name != exclude]
+        return snapshots[-1] if snapshots else None
+
+    def _seed(self, snapshot):
+        """以给定快照作为基准：重启后不会把全部监测点当作新增，其他进程写入更新的快照后也从它接着比较"""
+        import pandas as pd
+
+        try:
+            df = pd.read_excel(snapshot, sheet_name=0, dtype=str)
+            self._last, self._last_name = to_frame(df.to_dict("records")), snapshot.name
+        except Exception as e:
+            print(f"读取基准快照失败：{snapshot.name}（{e}）")
+
+    def apply(self, records, snapshot_name=""):
+        """计算与上一快照的差异，追加写入JSONL并返回本次变更记录"""
+        with self._lock:
+            # 内存中的上一快照不是最新的（如命令行抓取在其他进程中写入了更新的快照）时重新加载，
+            # 否则prev会跳过那次快照，其变化也会被重复输出
+            newest = self._newest(exclude=snapshot_name)
+            if newest is not None and newest.name != self._last_name:
+                self._seed(newest)
+            new = to_frame(records)
+            old = self._last if self._last is not None else new.iloc[0:0]
+            added, removed, changed = diff_frames(old, new)
+
+            change = {
+                "ts": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "snapshot": snapshot_name,
+                "prev": self._last_name,
+                "added": _records(added, {"省份_新": "省份", "辐射值_新": "辐射值", "剂量_新": "剂量",
+                                          "更新时间_新": "更新时间"}),
+                "removed": removed.index.tolist(),
+                "changed": _records(changed, {"辐射值_新": "辐射值", "剂量_新": "剂量", "差值": "差值",
+                                              "更新时间_新": "更新时间"}),
+                "unchanged": int(len(new) - len(added) - len(changed)),
+            }
+            self.changes_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.changes_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(change, ensure_ascii=False) + "\n")
+            self._last, self._last_name = new, snapshot_name
+            return change
+
+
+def read_changes(changes_path, offset=0):
+    """从字节偏移offset处读取新增的变更记录，返回 (记录列表, 新偏移)；下游保存偏移即可持续增量同步"""
+    path = Path(changes_path)
+    if not path.exists():
+        return [], offset
+    changes = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # 写入中的半行，下次再读
+            offset += len(line)
+            if line.strip():
+                changes.append(json.loads(line))
+    return changes, offset
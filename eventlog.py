@@ -0,0 +1,99 @@
+"""
+事件日志：SQLite落盘并按 id/时间/级别/任务类型 建索引，
+界面只按需读取可见窗口，写入成本与日志总量无关。
+"""
+import sqlite3
+import datetime
+import threading
+from pathlib import Path
+
+LEVELS = ["信息", "错误"]
+TASK_TYPES = ["定时", "手动", "系统"]
+
+
+class EventLog:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL,
+                level TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+            CREATE INDEX IF NOT EXISTS idx_events_level ON events(level, id);
+            CREATE INDEX IF NOT EXISTS idx_events_task ON events(task_type, id);
+        """)
+        self._conn.commit()
+
+    def append(self, message, level="信息", task_type="系统", ts=None):
+        """追加一条事件，返回其id"""
+        ts = ts or datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO events (ts, level, task_type, message) VALUES (?, ?, ?, ?)",
+                (ts, level, task_type, message))
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def last_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM events").fetchone()
+        return row[0] or 0
+
+    @staticmethod
+    def _where(level=None, task_type=None, date=None, keyword=None, min_id=0):
+        clauses, params = ["id > ?"], [min_id]
+        if level:
+            clauses.append("level = ?")
+            params.append(level)
+        if task_type:
+            clauses.append("task_type = ?")
+            params.append(task_type)
+        if date:
+            day = datetime.datetime.strptime(date, "%Y-%m-%d")
+            clauses.append("ts >= ? AND ts < ?")
+            params += [day.strftime('%Y-%m-%d'), (day + datetime.timedelta(days=1)).strftime('%Y-%m-%d')]
+        if keyword:
+            clauses.append("message LIKE ?")
+            params.append(f"%{keyword}%")
+        return " AND ".join(clauses), params
+
+    @staticmethod
+    def matches(event, level=None, task_type=None, date=None, keyword=None, min_id=0):
+        """判断新事件是否落在当前过滤条件内（用于增量维护计数，不必重新COUNT）"""
+        event_id, ts, event_level, event_task, message = event
+        return (event_id > min_id
+                and (not level or event_level == level)
+                and (not task_type or event_task == task_type)
+                and (not date or ts.startswith(date))
+                and (not keyword or keyword in message))
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM events WHERE {where}", params).fetchone()[0]
+
+    def page(self, offset, limit, total=None, **filters):
+        """按位置读取一页；已知总数且位置靠后时倒序查询，跟随最新日志只需读取可见行"""
+        where, params = self._where(**filters)
+        offset = max(0, offset)
+        sql = f"SELECT id, ts, level, task_type, message FROM events WHERE {where} "
+        with self._lock:
+            if total is not None and offset > total // 2:
+                end = min(offset + limit, total)
+                rows = self._conn.execute(sql + "ORDER BY id DESC LIMIT ? OFFSET ?",
+                                          params + [max(0, end - offset), total - end]).fetchall()
+                return rows[::-1]
+            return self._conn.execute(sql + "ORDER BY id LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
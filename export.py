@@ -0,0 +1,203 @@
+"""
+历史数据批量导出：按省份/时间范围过滤 data/ 下的快照，每个省份输出一个文件。
+
+    python export.py --province 北京 --province 天津 --months 6 --format csv --compression gzip
+    python main.py export --months 24 --format parquet --compression zstd
+
+分两阶段并行，内存只与单个快照/单个数据块大小有关：
+1. 按时间把快照分成若干段，各进程逐个读取并把行追加到“段/省份”中间文件；
+2. 各进程负责若干省份，按时间顺序分块读取中间文件，流式写入目标格式。
+"""
+import os
+import sys
+import gzip
+import argparse
+import datetime
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from history import HISTORY_COLUMNS, list_snapshots, read_snapshot
+
+EXPORT_FORMATS = ["csv", "xlsx", "parquet"]
+COMPRESSIONS = ["none", "gzip", "zstd"]
+CHUNK_ROWS = 50000
+
+
+def months_ago(now, months):
+    """now往前推months个自然月（日期超出当月天数时取月末）"""
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    day = min(now.day, [31, 29 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 28,
+                        31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1])
+    return now.replace(year=year, month=month, day=day)
+
+
+def _split_segment(paths, provinces, segment_dir):
+    """阶段1：读取一段快照，按省份追加到中间CSV，返回 {省份: 文件路径}"""
+    segment_dir = Path(segment_dir)
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    parts = {}
+    for path in paths:
+        try:
+            frame = read_snapshot(path, provinces)
+        except Exception as e:
+            print(f"读取快照失败：{Path(path).name}（{e}）")
+            continue
+        for province, group in frame.groupby("省份", sort=False):
+            part = parts.setdefault(province, segment_dir / f"{len(parts)}.csv")
+            group.to_csv(part, mode='a', header=not part.exists(), index=False)
+    return {province: str(part) for province, part in parts.items()}
+
+
+def _open_text(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd压缩需要安装zstandard（pip install zstandard）")
+        return zstandard.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8-sig', newline='')
+
+
+def _iter_chunks(part_paths, chunk_rows):
+    import pandas as pd
+
+    for part in part_paths:
+        for chunk in pd.read_csv(part, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+            yield chunk
+
+
+def _write_province(part_paths, out_path, fmt, compression, chunk_rows=CHUNK_ROWS):
+    """阶段2：把一个省份的中间文件（已按时间排序）分块流式写入目标文件，返回行数"""
+    rows = 0
+    if fmt == "csv":
+        with _open_text(out_path, compression) as f:
+            for chunk in _iter_chunks(part_paths, chunk_rows):
+                chunk.to_csv(f, header=rows == 0, index=False)
+                rows += len(chunk)
+    elif fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("导出parquet需要安装pyarrow（pip install pyarrow）")
+        schema = pa.schema([(c, pa.float64() if c == "剂量" else pa.string()) for c in HISTORY_COLUMNS])
+        codec = "none" if compression == "none" else compression
+        with pq.ParquetWriter(out_path, schema, compression=codec) as writer:
+            for chunk in _iter_chunks(part_paths, chunk_rows):
+                chunk["剂量"] = chunk["剂量"].astype(float)
+                writer.write_table(pa.Table.from_pandas(chunk[HISTORY_COLUMNS], schema=schema, preserve_index=False))
+                rows += len(chunk)
+    else:
+        # xlsx本身即zip压缩，使用openpyxl只写模式逐行写出
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("辐射数据")
+        sheet.append(HISTORY_COLUMNS)
+        for chunk in _iter_chunks(part_paths, chunk_rows):
+            chunk["剂量"] = chunk["剂量"].astype(float)
+            for row in chunk[HISTORY_COLUMNS].itertuples(index=False):
+                sheet.append(list(row))
+            rows += len(chunk)
+        workbook.save(out_path)
+    return rows
+
+
+def output_name(province, start, end, fmt, compression):
+    suffix = {"csv": ".csv", "xlsx": ".xlsx", "parquet": ".parquet"}[fmt]
+    if fmt == "csv" and compression != "none":
+        suffix += {"gzip": ".gz", "zstd": ".zst"}[compression]
+    span = f"{start:%Y%m%d}-{end:%Y%m%d}" if start else f"至{end:%Y%m%d}"
+    return f"{province}_{span}{suffix}"
+
+
+def export_history(data_dir, out_dir, provinces=None, start=None, end=None, fmt="csv", compression="none",
+                   workers=None, file_prefix="辐射监测数据", chunk_rows=CHUNK_ROWS, log=print):
+    """导出过滤后的历史数据，每个省份一个文件，返回 {省份: (输出路径, 行数)}"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}（可选：{', '.join(EXPORT_FORMATS)}）")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"不支持的压缩方式：{compression}（可选：{', '.join(COMPRESSIONS)}）")
+    if fmt == "xlsx" and compression != "none":
+        log("xlsx本身已压缩，忽略compression参数")
+        compression = "none"
+
+    end = end or datetime.datetime.now()
+    snapshots = list_snapshots(data_dir, file_prefix, start, end)
+    if not snapshots:
+        log("时间范围内没有快照文件")
+        return {}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(snapshots)))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    log(f"共{len(snapshots)}个快照，使用{workers}个进程导出")
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp, ProcessPoolExecutor(max_workers=workers) as pool:
+        # 阶段1：按时间连续分段，段号即时间顺序
+        size = -(-len(snapshots) // workers)
+        segments = [snapshots[i:i + size] for i in range(0, len(snapshots), size)]
+        futures = [pool.submit(_split_segment, segment, provinces, os.path.join(tmp, str(i)))
+                   for i, segment in enumerate(segments)]
+        parts = {}
+        for future in futures:
+            for province, part in future.result().items():
+                parts.setdefault(province, []).append(part)
+
+        # 阶段2：各省份并行写出
+        futures = {}
+        for province, part_paths in parts.items():
+            out_path = out_dir / output_name(province, start, end, fmt, compression)
+            futures[province] = (out_path, pool.submit(_write_province, part_paths, str(out_path), fmt,
+                                                       compression, chunk_rows))
+        for province, (out_path, future) in futures.items():
+            try:
+                rows = future.result()
+                results[province] = (str(out_path), rows)
+                log(f"{province}：{rows}行 -> {out_path.name}")
+            except Exception as e:
+                log(f"{province}导出失败：{e}")
+    return results
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog="export", description="按省份批量导出历史辐射数据")
+    parser.add_argument("--province", action="append", help="省份，可重复；不填则导出全部省份")
+    parser.add_argument("--months", type=int, help="最近N个月")
+    parser.add_argument("--start", help="开始日期 YYYY-MM-DD（与--months二选一）")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD，默认当前时间")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--workers", type=int, help="进程数，默认CPU核数")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--prefix", default="辐射监测数据", help="快照文件名前缀（config.ini中的file_prefix）")
+    parser.add_argument("--out", default="exports")
+    args = parser.parse_args(argv)
+
+    try:
+        end = (datetime.datetime.strptime(args.end, "%Y-%m-%d") + datetime.timedelta(days=1, microseconds=-1)
+               if args.end else datetime.datetime.now())
+        start = datetime.datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    except ValueError:
+        print("日期格式应为YYYY-MM-DD")
+        return 2
+    if args.months:
+        start = months_ago(end, args.months)
+
+    try:
+        results = export_history(args.data_dir, args.out, provinces=args.province, start=start, end=end,
+                                 fmt=args.format, compression=args.compression, workers=args.workers,
+                                 file_prefix=args.prefix)
+    except (ValueError, RuntimeError) as e:
+        print(f"导出失败：{e}")
+        return 1
+    print(f"导出完成：{len(results)}个文件，共{sum(rows for _, rows in results.values())}行")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
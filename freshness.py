@@ -0,0 +1,121 @@
+"""
+数据新鲜度：记录每个监测点最近看到的“更新时间”，计算新鲜度指数，
+并根据源站通常的发布时间自适应安排下一次轮询：
+发布窗口内快速轮询，全部监测点已是最新数据后退避到下一个发布窗口。
+"""
+import json
+import datetime
+import statistics
+import threading
+from pathlib import Path
+
+from spool import atomic_write, file_stamp
+
+MAX_OBSERVATIONS = 30
+
+
+def parse_date(value):
+    try:
+        return datetime.datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+class FreshnessTracker:
+    def __init__(self, path, publish_time="10:00", window_minutes=60, fast_minutes=10,
+                 slow_minutes=60, fresh_ratio=0.95):
+        self.path = Path(path)
+        self.default_publish = datetime.datetime.strptime(publish_time, "%H:%M").time()
+        self.window = datetime.timedelta(minutes=window_minutes)
+        self.fast = datetime.timedelta(minutes=fast_minutes)
+        self.slow = datetime.timedelta(minutes=slow_minutes)
+        self.fresh_ratio = fresh_ratio
+        self._lock = threading.Lock()
+        self.stations = {}       # 监测点 -> 最近看到的更新日期（YYYY-MM-DD）
+        self.observations = []   # 首次看到新日期时的时刻（HH:MM），用于估计发布时间
+        self.lags = []           # 首次看到新日期时距该日期的天数（源站通常发布前一天的数据）
+        self._stamp = None
+        self._load()
+
+    def _reload_if_changed(self):
+        """其他进程（如命令行抓取）写入过状态文件时重新读取，避免用旧状态覆盖"""
+        if file_stamp(self.path) != self._stamp:
+            self._load()
+
+    def _load(self):
+        self._stamp = file_stamp(self.path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.stations = dict(state.get("stations", {}))
+            self.observations = list(state.get("observations", []))
+            self.lags = list(state.get("lags", []))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"读取新鲜度状态失败：{e}")
+
+    def _save(self):
+        state = {"stations": self.stations, "observations": self.observations, "lags": self.lags}
+        atomic_write(self.path, json.dumps(state, ensure_ascii=False).encode('utf-8'))
+        self._stamp = file_stamp(self.path)
+
+    def usual_publish_time(self):
+        """近期首次观测到新数据的中位时刻，无记录时取配置的crawl_time"""
+        if not self.observations:
+            return self.default_publish
+        minutes = statistics.median(int(t[:2]) * 60 + int(t[3:5]) for t in self.observations)
+        return datetime.time(int(minutes) // 60, int(minutes) % 60)
+
+    def expected_date(self, now=None):
+        """当前应当能看到的最新更新日期"""
+        now = now or datetime.datetime.now()
+        lag = int(statistics.median(self.lags)) if self.lags else 1
+        return now.date() - datetime.timedelta(days=lag)
+
+    def summary(self, now=None):
+        """新鲜度指数 = 已达到预期日期的监测点占比"""
+        with self._lock:
+            self._reload_if_changed()
+            expected = self.expected_date(now)
+            total = len(self.stations)
+            current = sum(1 for d in self.stations.values() if (parse_date(d) or datetime.date.min) >= expected)
+        return {"index": current / total if total else 0.0, "current": current, "total": total,
+                "expected": expected.isoformat()}
+
+    def update(self, records, now=None):
+        """合并一批记录，返回摘要，updated为更新日期前进了的监测点数"""
+        now = now or datetime.datetime.now()
+        with self._lock:
+            self._reload_if_changed()
+            previous_max = max(filter(None, map(parse_date, self.stations.values())), default=None)
+            updated = 0
+            for record in records or []:
+                station, date = record.get("监测点"), parse_date(record.get("更新时间"))
+                if not station or date is None:
+                    continue
+                seen = parse_date(self.stations.get(station, ""))
+                if seen is None or date > seen:
+                    self.stations[station] = date.isoformat()
+                    updated += 1
+            batch_max = max(filter(None, (parse_date(r.get("更新时间")) for r in records or [])), default=None)
+            if batch_max and previous_max and batch_max > previous_max:
+                self.observations = (self.observations + [now.strftime("%H:%M")])[-MAX_OBSERVATIONS:]
+                self.lags = (self.lags + [(now.date() - batch_max).days])[-MAX_OBSERVATIONS:]
+            self._save()
+        result = self.summary(now)
+        result["updated"] = updated
+        return result
+
+    def next_poll(self, now=None):
+        """已是最新：退避到明天的发布窗口；否则窗口前等到窗口开始，窗口内按fast轮询，窗口后按slow轮询"""
+        now = now or datetime.datetime.now()
+        publish = datetime.datetime.combine(now.date(), self.usual_publish_time())
+        window_start, window_end = publish - self.window, publish + self.window
+        if self.stations and self.summary(now)["index"] >= self.fresh_ratio:
+            return window_start + datetime.timedelta(days=1)
+        if now < window_start:
+            return window_start
+        if now <= window_end:
+            return now + self.fast
+        return now + self.slow
@@ -0,0 +1,275 @@
+"""
+监测点地理索引：从本地CSV（监测点,省份,纬度,经度）加载坐标，建立内存KD树，
+支持“离某坐标最近的N个监测点”“矩形范围/省份（多边形）内的监测点”查询，并关联最新读数。
+
+    python geo.py --near 39.9,116.4 -n 5
+    python main.py stations --bbox 30,110,40,120
+    python geo.py --province 北京 --polygons provinces.geojson
+
+本模块依赖numpy，main.py只在需要时导入。
+"""
+import csv
+import sys
+import json
+import heapq
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+STATION_FIELDS = ["监测点", "省份", "纬度", "经度"]
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+
+
+def load_stations(path):
+    """读取坐标表，坐标缺失或越界的行跳过，同名监测点以最后一行为准"""
+    stations = {}
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row["纬度"]), float(row["经度"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            name = (row.get("监测点") or "").strip()
+            if not name or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            stations[name] = {"监测点": name, "省份": (row.get("省份") or "").strip(), "纬度": lat, "经度": lon}
+    return list(stations.values())
+
+
+def load_polygons(path):
+    """读取GeoJSON边界（Polygon/MultiPolygon），返回 {名称: [外环坐标数组(经度,纬度)]}；名称取properties中的name或省份"""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f).get("features", [])
+    polygons = {}
+    for feature in features:
+        props = feature.get("properties") or {}
+        name = props.get("省份") or props.get("name")
+        geometry = feature.get("geometry") or {}
+        if not name or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        parts = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        rings = polygons.setdefault(str(name), [])
+        rings.extend(np.asarray(part[0], dtype=float)[:, :2] for part in parts if part)
+    return polygons
+
+
+def unit_vectors(lat, lon):
+    """经纬度 -> 单位球面三维坐标；三维欧氏距离（弦长）与球面距离单调对应，可直接用KD树"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def points_in_ring(lon, lat, ring):
+    """射线法判断一批点是否在多边形环内（按经纬度平面计算，适用于省级尺度）"""
+    inside = np.zeros(len(lon), dtype=bool)
+    x0, y0 = ring[-1]
+    for x1, y1 in ring:
+        crosses = (y1 > lat) != (y0 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = (x0 - x1) * (lat - y1) / (y0 - y1) + x1
+        inside ^= crosses & (lon < x_cross)
+        x0, y0 = x1, y1
+    return inside
+
+
+class KDTree:
+    """静态KD树：节点按数组存储，叶子内用向量化计算距离"""
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = np.asarray(points, dtype=float)
+        self.order = np.arange(len(self.points))
+        self.leaf_size = leaf_size
+        # 节点：[起始, 结束, 切分维度, 切分值, 左子节点, 右子节点]，叶子的切分维度为-1
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def _build(self, start, end):
+        node = len(self.nodes)
+        self.nodes.append([start, end, -1, 0.0, -1, -1])
+        if end - start <= self.leaf_size:
+            return node
+        block = self.points[self.order[start:end]]
+        axis = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+        mid = (end - start) // 2
+        part = np.argpartition(block[:, axis], mid)
+        self.order[start:end] = self.order[start:end][part]
+        split = self.points[self.order[start + mid], axis]
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self.nodes[node][2:] = [axis, split, left, right]
+        return node
+
+    def query(self, point, k=1):
+        """返回距离point最近的k个点：(距离数组, 下标数组)，按距离升序"""
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self.points))
+        if k <= 0:
+            return np.empty(0), np.empty(0, dtype=int)
+        best = []  # 大顶堆 (-距离, 下标)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            start, end, axis, split, left, right = self.nodes[node]
+            if axis < 0:
+                idx = self.order[start:end]
+                dist = np.sqrt(((self.points[idx] - point) ** 2).sum(axis=1))
+                for d, i in zip(dist.tolist(), idx.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            diff = point[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, abs(diff)))
+            stack.append((near, 0.0))
+        best.sort(reverse=True)
+        return np.array([-d for d, _ in best]), np.array([i for _, i in best], dtype=int)
+
+
+class StationIndex:
+    """监测点空间索引：最近邻走KD树，矩形范围按纬度排序后二分，省份优先用边界多边形、否则按省份列"""
+
+    def __init__(self, stations, polygons=None):
+        self.stations = list(stations)
+        self.names = np.array([s["监测点"] for s in self.stations], dtype=object)
+        self.provinces = np.array([s["省份"] for s in self.stations], dtype=object)
+        self.lat = np.array([s["纬度"] for s in self.stations], dtype=float)
+        self.lon = np.array([s["经度"] for s in self.stations], dtype=float)
+        self.polygons = polygons or {}
+        self.tree = KDTree(unit_vectors(self.lat, self.lon))
+        self._lat_order = np.argsort(self.lat, kind="stable")
+        self._lat_sorted = self.lat[self._lat_order]
+        self._by_province = {}
+        for i, province in enumerate(self.provinces):
+            self._by_province.setdefault(province, []).append(i)
+
+    @classmethod
+    def from_files(cls, stations_path, polygons_path=None):
+        return cls(load_stations(stations_path), load_polygons(polygons_path) if polygons_path else None)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def nearest(self, lat, lon, n=5):
+        """最近的n个监测点：(下标数组, 球面距离km数组)"""
+        chord, idx = self.tree.query(unit_vectors([lat], [lon])[0], n)
+        return idx, chord_to_km(chord)
+
+    def in_bbox(self, south, west, north, east):
+        """矩形范围内的监测点下标；west > east 时视为跨越180°经线"""
+        lo = np.searchsorted(self._lat_sorted, south, side="left")
+        hi = np.searchsorted(self._lat_sorted, north, side="right")
+        idx = self._lat_order[lo:hi]
+        lon = self.lon[idx]
+        mask = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+        return np.sort(idx[mask])
+
+    def in_polygon(self, rings):
+        """落在任一多边形环内的监测点下标；先用外接矩形过滤"""
+        hits = []
+        for ring in rings:
+            ring = np.asarray(ring, dtype=float)
+            idx = self.in_bbox(ring[:, 1].min(), ring[:, 0].min(), ring[:, 1].max(), ring[:, 0].max())
+            hits.append(idx[points_in_ring(self.lon[idx], self.lat[idx], ring)])
+        return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=int)
+
+    def in_province(self, province):
+        if province in self.polygons:
+            return self.in_polygon(self.polygons[province])
+        return np.array(self._by_province.get(province, []), dtype=int)
+
+    def rows(self, indices, distances=None, readings=None):
+        """查询结果转为记录列表，按监测点关联最新读数（readings: {监测点: 记录}）"""
+        readings = readings or {}
+        rows = []
+        for pos, i in enumerate(np.asarray(indices, dtype=int).tolist()):
+            row = dict(self.stations[i])
+            if distances is not None:
+                row["距离km"] = round(float(distances[pos]), 2)
+            reading = readings.get(row["监测点"]) or {}
+            for field in ("辐射值", "剂量", "更新时间"):
+                row[field] = reading.get(field)
+            rows.append(row)
+        return rows
+
+
+def latest_readings(data_dir, file_prefix="辐射监测数据", state_path=None):
+    """各监测点最新读数 {监测点: 记录}：优先取最新状态快照，没有时读取data/中最新的xlsx"""
+    from history import list_snapshots, read_snapshot
+
+    if state_path and Path(state_path).exists():
+        from latest import LatestState
+
+        view = LatestState(state_path).view
+        if len(view):
+            return view.records()
+    snapshots = list_snapshots(data_dir, file_prefix)
+    if not snapshots:
+        return {}
+    frame = read_snapshot(snapshots[-1])
+    return {row["监测点"]: row for row in frame.drop_duplicates("监测点", keep="last").to_dict("records")}
+
+
+def _floats(text, count, name):
+    try:
+        values = [float(v) for v in text.replace("，", ",").split(",")]
+    except ValueError:
+        values = []
+    if len(values) != count:
+        raise ValueError(f"{name}应为{count}个以逗号分隔的数字")
+    return values
+
+
+def cli(argv=None):
+    default_stations = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent)) / "stations.csv"
+    parser = argparse.ArgumentParser(prog="stations", description="按位置/范围/省份查询监测点及最新读数")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--near", metavar="纬度,经度", help="最近的监测点")
+    group.add_argument("--bbox", metavar="南,西,北,东", help="矩形范围内的监测点")
+    group.add_argument("--province", help="省份内的监测点（有边界文件时按多边形判断）")
+    parser.add_argument("-n", type=int, default=5, help="--near返回的数量")
+    parser.add_argument("--stations", default=str(default_stations), help="坐标表CSV")
+    parser.add_argument("--polygons", help="省份边界GeoJSON")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--prefix", default="辐射监测数据", help="快照文件名前缀（config.ini中的file_prefix）")
+    parser.add_argument("--state", default="state/latest.pkl", help="最新状态快照（config.ini中[LATEST] path）")
+    args = parser.parse_args(argv)
+
+    try:
+        index = StationIndex.from_files(args.stations, args.polygons)
+        distances = None
+        if args.near:
+            indices, distances = index.nearest(*_floats(args.near, 2, "--near"), n=args.n)
+        elif args.bbox:
+            indices = index.in_bbox(*_floats(args.bbox, 4, "--bbox"))
+        else:
+            indices = index.in_province(args.province)
+    except (OSError, ValueError) as e:
+        print(f"查询失败：{e}")
+        return 1
+
+    try:
+        readings = latest_readings(args.data_dir, args.prefix, args.state)
+    except Exception as e:
+        print(f"读取最新快照失败：{e}")
+        readings = {}
+    for row in index.rows(indices, distances, readings):
+        distance = f"{row['距离km']:>8.1f} km  " if "距离km" in row else ""
+        print(f"{distance}{row['监测点']:<24} ({row['纬度']:.2f}, {row['经度']:.2f})  "
+              f"{row['辐射值'] or '无读数'}  {row['更新时间'] or ''}")
+    print(f"共{len(indices)}个监测点")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,172 @@
+"""
+历史数据：读取 data/ 下的抓取快照，按监测点/省份提供剂量时间序列，
+并提供绘图前的降采样（LTTB、最小/最大值分桶）。
+"""
+import re
+import datetime
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+SNAPSHOT_TIME_RE = re.compile(r"_(\d{8}_\d{6})\.xlsx$")
+DOSE_PATTERN = r"([-+]?\d+(?:\.\d+)?)"
+HISTORY_COLUMNS = ["采集时间", "省份", "监测点", "辐射值", "剂量", "更新时间"]
+
+
+def snapshot_time(path):
+    """从文件名（前缀_YYYYmmdd_HHMMSS.xlsx）取采集时间，无法识别时返回None"""
+    match = SNAPSHOT_TIME_RE.search(Path(path).name)
+    if not match:
+        return None
+    return datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+
+
+def read_snapshot(path, provinces=None):
+    """读取单个快照为长表（HISTORY_COLUMNS），剂量为辐射值中的数值（nGy/h）；可只保留指定省份"""
+    import pandas as pd
+
+    df = pd.read_excel(path, sheet_name=0, dtype=str)
+    column = lambda name, default: df[name] if name in df else pd.Series(default, index=df.index, dtype=object)
+    frame = pd.DataFrame({
+        "采集时间": pd.Timestamp(snapshot_time(path)),
+        "省份": column("省份", "省份未知"),
+        "监测点": column("监测点", "名称缺失"),
+        "辐射值": column("辐射值", "数值缺失"),
+        "更新时间": column("更新时间", "时间缺失"),
+    })
+    if provinces:
+        frame = frame[frame["省份"].isin(provinces)]
+    frame.insert(4, "剂量", pd.to_numeric(frame["辐射值"].str.extract(DOSE_PATTERN)[0], errors="coerce"))
+    return frame.dropna(subset=["剂量"])
+
+
+def list_snapshots(data_dir, file_prefix="辐射监测数据", start=None, end=None):
+    """按采集时间排序列出快照文件，只看文件名即可按时间范围过滤，不必读取内容"""
+    snapshots = []
+    for path in Path(data_dir).glob(f"{file_prefix}_*.xlsx"):
+        stamp = snapshot_time(path)
+        if stamp is None or (start and stamp < start) or (end and stamp > end):
+            continue
+        snapshots.append((stamp, path))
+    return [path for _, path in sorted(snapshots)]
+
+
+class HistoryStore:
+    """快照历史：每个文件只读取一次（按mtime判断），序列按 (类型, 名称) 做LRU缓存"""
+
+    def __init__(self, data_dir, file_prefix="辐射监测数据", cache_size=64):
+        self.data_dir = Path(data_dir)
+        self.file_prefix = file_prefix
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._files = {}
+        self._frame = None
+        self._series_cache = OrderedDict()
+
+    def refresh(self):
+        """扫描新增/变更的快照文件，返回是否有变化"""
+        import pandas as pd
+
+        with self._lock:
+            seen, changed = set(), False
+            for path in list_snapshots(self.data_dir, self.file_prefix):
+                seen.add(path)
+                mtime = path.stat().st_mtime
+                cached = self._files.get(path)
+                if cached and cached[0] == mtime:
+                    continue
+                try:
+                    self._files[path] = (mtime, read_snapshot(path))
+                    changed = True
+                except Exception as e:
+                    print(f"读取历史快照失败：{path.name}（{e}）")
+            for path in set(self._files) - seen:
+                del self._files[path]
+                changed = True
+            if changed or self._frame is None:
+                frames = [frame for _, frame in self._files.values()]
+                self._frame = (pd.concat(frames, ignore_index=True) if frames
+                               else pd.DataFrame(columns=HISTORY_COLUMNS))
+                self._series_cache.clear()
+            return changed
+
+    def frame(self):
+        if self._frame is None:
+            self.refresh()
+        return self._frame
+
+    def names(self, kind="监测点"):
+        """列出全部监测点或省份"""
+        return sorted(self.frame()[kind].dropna().unique().tolist())
+
+    def series(self, kind, name):
+        """返回 (秒级时间戳数组, 剂量数组)，省份序列为同一采集时间内各站均值"""
+        key = (kind, name)
+        with self._lock:
+            if key in self._series_cache:
+                self._series_cache.move_to_end(key)
+                return self._series_cache[key]
+
+        df = self.frame()
+        subset = df[df[kind] == name]
+        grouped = subset.groupby("采集时间")["剂量"].mean().sort_index()
+        x = grouped.index.values.astype("datetime64[s]").astype("int64")
+        y = grouped.values.astype("float64")
+
+        with self._lock:
+            self._series_cache[key] = (x, y)
+            while len(self._series_cache) > self.cache_size:
+                self._series_cache.popitem(last=False)
+        return x, y
+
+
+# ------------------------------
+# 降采样（绘制前把点数压到画布宽度量级）
+# ------------------------------
+def minmax_downsample(x, y, n_buckets):
+    """每个桶保留最小值和最大值，保证尖峰不丢失；等宽分桶后reshape，一次argmin/argmax完成"""
+    import numpy as np
+
+    n = len(x)
+    if n <= 2 * n_buckets or n_buckets < 1:
+        return x, y
+    size = -(-n // n_buckets)
+    full = n // size
+    grid = y[:full * size].reshape(full, size)
+    base = np.arange(full) * size
+    lows = [base + grid.argmin(axis=1)]
+    highs = [base + grid.argmax(axis=1)]
+    if full * size < n:
+        tail = y[full * size:]
+        lows.append([full * size + int(tail.argmin())])
+        highs.append([full * size + int(tail.argmax())])
+    lows, highs = np.concatenate(lows), np.concatenate(highs)
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return x[keep], y[keep]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets：保留视觉形状的降采样"""
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    x_f = x.astype("float64")
+    edges = np.linspace(1, n - 1, threshold - 1).astype("int64")
+    keep = np.empty(threshold, dtype="int64")
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x_f[end:next_end].mean() if next_end > end else x_f[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs((x_f[a] - avg_x) * (y[start:end] - y[a])
+                      - (x_f[a] - x_f[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": lambda x, y, n: minmax_downsample(x, y, max(1, n // 2))}
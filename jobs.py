@@ -0,0 +1,240 @@
+"""
+作业协调：SQLite租约表 + 作业表，跨进程（界面、命令行/计划任务）协调抓取与Git操作。
+- run(name, func)：同名作业同一时刻只运行一个；已在运行时不重复执行，等待它完成并返回同一结果
+- lease(name)：独占租约（如git），持有期间后台续期；持有者异常退出后租约过期即可被接管
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+KEEP_JOBS = 1000
+
+
+class _LocalJob:
+    """进程内正在运行的作业，同进程的重复请求直接等待它，不必轮询数据库"""
+
+    def __init__(self, requested_by):
+        self.requested_by = requested_by
+        self.started = time.time()
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class JobCoordinator:
+    def __init__(self, path, lease_seconds=60, poll_interval=0.2):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = {}
+        self._local_lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    job_id INTEGER,
+                    expires REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    requested_by TEXT NOT NULL DEFAULT '',
+                    waiters INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    finished REAL,
+                    result TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_name ON jobs(name, id);
+            """)
+
+    def _connect(self):
+        # 自动提交模式，需要原子性的地方显式 BEGIN IMMEDIATE（立即取得写锁，避免两个进程同时判定租约空闲）
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------
+    # 租约
+    # ------------------------------
+    def _try_acquire(self, name, token, job_name=None, requested_by=""):
+        """返回 (作业id, None)；租约被他人持有时返回 (None, 持有者信息)"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT l.owner, l.job_id, l.expires, j.requested_by, j.created FROM leases l "
+                                   "LEFT JOIN jobs j ON j.id = l.job_id WHERE l.name = ?", (name,)).fetchone()
+                if row and row["expires"] > now:
+                    conn.execute("COMMIT")
+                    return None, dict(row)
+                if row and row["job_id"]:
+                    # 持有者未续期即退出（进程崩溃/被杀），其作业记为失败后接管
+                    conn.execute("UPDATE jobs SET state = 'failed', finished = ?, result = ? WHERE id = ? AND state = 'running'",
+                                 (now, json.dumps({"error": "租约过期"}, ensure_ascii=False), row["job_id"]))
+                job_id = None
+                if job_name:
+                    job_id = conn.execute("INSERT INTO jobs (name, state, owner, requested_by, created) "
+                                          "VALUES (?, 'running', ?, ?, ?)",
+                                          (job_name, self.owner, requested_by, now)).lastrowid
+                conn.execute("INSERT OR REPLACE INTO leases (name, token, owner, job_id, expires) VALUES (?, ?, ?, ?, ?)",
+                             (name, token, self.owner, job_id, now + self.lease_seconds))
+                conn.execute("COMMIT")
+                return job_id, None
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _release(self, name, token, job_id=None, state="done", result=None, waiters=0):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE name = ? AND token = ?", (name, token))
+            if job_id:
+                conn.execute("UPDATE jobs SET state = ?, finished = ?, result = ?, waiters = waiters + ? WHERE id = ?",
+                             (state, time.time(), json.dumps(result, ensure_ascii=False), waiters, job_id))
+                conn.execute("DELETE FROM jobs WHERE name = ? AND id <= ?", (name, job_id - KEEP_JOBS))
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _heartbeat(self, name, token):
+        """每隔租约时长的1/3续期一次"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    with closing(self._connect()) as conn:
+                        conn.execute("UPDATE leases SET expires = ? WHERE name = ? AND token = ?",
+                                     (time.time() + self.lease_seconds, name, token))
+                except sqlite3.Error as e:
+                    print(f"租约续期失败（{name}）：{e}")
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    @contextmanager
+    def lease(self, name, timeout=None, on_wait=None):
+        """独占租约，等待超过timeout秒抛出TimeoutError；需要等待时先调用一次on_wait(持有者信息)"""
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        notified = False
+        while True:
+            _, holder = self._try_acquire(name, token)
+            if holder is None:
+                break
+            if on_wait and not notified:
+                on_wait(holder)
+                notified = True
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"等待{name}超时（持有者：{holder['owner']}）")
+            time.sleep(self.poll_interval)
+        with self._heartbeat(name, token):
+            try:
+                yield
+            finally:
+                self._release(name, token)
+
+    # ------------------------------
+    # 作业合并
+    # ------------------------------
+    def _wait_job(self, name, job_id, deadline):
+        """等待其他进程的作业结束：完成返回 (True, 结果)；租约过期（持有者已退出）返回 (False, None) 以便接管"""
+        while True:
+            with closing(self._connect()) as conn:
+                # 同一读事务内读取，释放租约与写入结果在同一事务中完成，两者状态一致
+                conn.execute("BEGIN")
+                job = conn.execute("SELECT state, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                lease = conn.execute("SELECT job_id, expires FROM leases WHERE name = ?", (name,)).fetchone()
+                conn.execute("COMMIT")
+            if job is None or job["state"] == "failed":
+                error = json.loads(job["result"] or "{}").get("error") if job else "作业记录不存在"
+                if error == "租约过期":
+                    return False, None
+                raise RuntimeError(f"{name}作业失败：{error}")
+            if job["state"] == "done":
+                return True, json.loads(job["result"] or "null")
+            if lease is None or lease["job_id"] != job_id or lease["expires"] < time.time():
+                return False, None
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"等待{name}作业超时")
+            time.sleep(self.poll_interval)
+
+    def _run_leader(self, name, func, local, timeout, on_wait):
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        notified = False
+        while True:
+            job_id, holder = self._try_acquire(name, token, job_name=name, requested_by=local.requested_by)
+            if holder is None:
+                break
+            if on_wait and not notified:
+                on_wait(holder)
+                notified = True
+            with closing(self._connect()) as conn:
+                conn.execute("UPDATE jobs SET waiters = waiters + 1 WHERE id = ?", (holder["job_id"],))
+            finished, result = self._wait_job(name, holder["job_id"], deadline)
+            if finished:
+                return result
+
+        with self._heartbeat(name, token):
+            try:
+                # 经JSON往返，保证本进程与其他进程的等待者拿到的结果一致
+                result = json.loads(json.dumps(func(), ensure_ascii=False))
+            except Exception as e:
+                self._release(name, token, job_id, "failed", {"error": str(e)[:200]}, local.waiters)
+                raise
+            self._release(name, token, job_id, "done", result, local.waiters)
+        return result
+
+    def run(self, name, func, requested_by="", timeout=None, on_wait=None):
+        """运行名为name的作业并返回func()的结果（须可JSON序列化）。
+        同名作业已在本进程或其他进程运行时，不再执行func，等待并返回那次的结果。"""
+        with self._local_lock:
+            local = self._local.get(name)
+            leader = local is None
+            if leader:
+                local = self._local[name] = _LocalJob(requested_by)
+            else:
+                local.waiters += 1
+        if not leader:
+            if on_wait:
+                on_wait({"owner": self.owner, "requested_by": local.requested_by, "created": local.started})
+            if not local.done.wait(timeout):
+                raise TimeoutError(f"等待{name}作业超时")
+            if local.error is not None:
+                raise RuntimeError(f"{name}作业失败：{local.error}")
+            return local.result
+
+        try:
+            local.result = self._run_leader(name, func, local, timeout, on_wait)
+            return local.result
+        except Exception as e:
+            local.error = e
+            raise
+        finally:
+            with self._local_lock:
+                self._local.pop(name, None)
+            local.done.set()
+
+    def recent(self, name, limit=20):
+        """最近的作业记录（最新在前）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE name = ? ORDER BY id DESC LIMIT ?", (name, limit)).fetchall()
+        return [dict(row) for row in rows]
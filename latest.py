@@ -0,0 +1,177 @@
+"""
+最新状态缓存：每个监测点的最新读数，常驻内存并按监测点/省份建索引，启动时从二进制快照加载。
+
+- 读取无锁：state.view 是不可变的 LatestView，读者拿到引用后随便用，不会看到写了一半的状态
+- 写入写时复制：抓取线程在副本上合并新记录，落盘后整体替换 view 引用
+- 按列存储（每个字段一个元组）：落盘/加载只是pickle几个元组，不为每个监测点构造字典，
+  记录在 get() 时才组装；省份索引随快照一起保存
+- 落盘：pickle协议5，不依赖pandas/numpy，经spool.atomic_write（fsync后rename）写入
+- 其他进程（如命令行抓取）写入后，refresh() 按文件时间戳重新加载
+"""
+import re
+import pickle
+import datetime
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+from history import DOSE_PATTERN
+from freshness import parse_date
+from spool import atomic_write, file_stamp
+
+STATE_FIELDS = ["省份", "监测点", "辐射值", "剂量", "更新时间", "来源", "采集时间"]
+FORMAT_VERSION = 1
+
+
+def parse_dose(value):
+    match = re.search(DOSE_PATTERN, str(value))
+    return float(match.group(1)) if match else None
+
+
+def province_index(provinces):
+    """省份 -> 行号元组"""
+    index = {}
+    for row, province in enumerate(provinces):
+        index.setdefault(province, []).append(row)
+    return {province: tuple(rows) for province, rows in index.items()}
+
+
+class LatestView:
+    """某一时刻的最新状态（只读）：columns 字段 -> 元组，index 监测点 -> 行号，provinces 省份 -> 行号元组"""
+
+    def __init__(self, columns=None, version=0, crawl_time="", provinces=None):
+        columns = columns or {field: () for field in STATE_FIELDS}
+        self.version = version
+        self.crawl_time = crawl_time
+        self.columns = MappingProxyType({field: tuple(columns[field]) for field in STATE_FIELDS})
+        self.index = MappingProxyType(dict(zip(self.columns["监测点"], range(len(self.columns["监测点"])))))
+        self.provinces = MappingProxyType(provinces if provinces is not None
+                                          else province_index(self.columns["省份"]))
+
+    def __len__(self):
+        return len(self.index)
+
+    def _record(self, row):
+        return {field: self.columns[field][row] for field in STATE_FIELDS}
+
+    def get(self, station):
+        row = self.index.get(station)
+        return None if row is None else self._record(row)
+
+    def in_province(self, province):
+        return [self._record(row) for row in self.provinces.get(province, ())]
+
+    def records(self):
+        """全部记录 {监测点: 记录}"""
+        return {name: self._record(row) for name, row in self.index.items()}
+
+    def summary(self):
+        """界面显示用：监测点数、省份数、最新更新时间、最高读数"""
+        if not self.index:
+            return {"stations": 0, "provinces": 0, "updated": "", "max": None}
+        doses = [(dose, row) for row, dose in enumerate(self.columns["剂量"]) if dose is not None]
+        dates = [date for date in map(parse_date, self.columns["更新时间"]) if date is not None]
+        return {
+            "stations": len(self.index),
+            "provinces": len(self.provinces),
+            "updated": max(dates).isoformat() if dates else "",
+            "max": self._record(max(doses)[1]) if doses else None,
+        }
+
+
+class LatestState:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.view = LatestView()
+        self.refresh()
+
+    def refresh(self):
+        """快照文件被其他进程更新过时重新加载，返回当前view"""
+        with self._lock:
+            self._reload_if_changed()
+        return self.view
+
+    def _reload_if_changed(self):
+        stamp = file_stamp(self.path)
+        if stamp is None or stamp == self._stamp:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get("format") != FORMAT_VERSION:
+                raise ValueError(f"快照格式{state.get('format')}不受支持")
+            self.view = LatestView(dict(zip(state["fields"], state["columns"])), state["version"],
+                                   state["crawl_time"], state["provinces"])
+        except Exception as e:
+            print(f"读取最新状态快照失败：{e}")
+        self._stamp = stamp
+
+    def _save(self, view):
+        state = {
+            "format": FORMAT_VERSION,
+            "version": view.version,
+            "crawl_time": view.crawl_time,
+            "fields": STATE_FIELDS,
+            "columns": [view.columns[field] for field in STATE_FIELDS],
+            "provinces": dict(view.provinces),
+        }
+        atomic_write(self.path, pickle.dumps(state, protocol=5))
+        self._stamp = file_stamp(self.path)
+
+    def update(self, records, crawl_time=None):
+        """合并一次抓取的记录，返回更新的监测点数。
+        更新时间按日期比较，早于已有读数的记录忽略；日期无法解析（如“时间缺失”）的记录不参与合并"""
+        crawl_time = (crawl_time or datetime.datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._reload_if_changed()
+            base = self.view
+            columns = {field: list(base.columns[field]) for field in STATE_FIELDS}
+            index = dict(base.index)
+            changed = 0
+            for record in records or []:
+                name = str(record.get("监测点") or "")
+                updated = str(record.get("更新时间") or "")
+                date = parse_date(updated)
+                row = index.get(name)
+                if not name or date is None:
+                    continue
+                if row is not None:
+                    old = parse_date(columns["更新时间"][row])
+                    if old is not None and date < old:
+                        continue
+                values = {
+                    "省份": str(record.get("省份") or ""),
+                    "监测点": name,
+                    "辐射值": str(record.get("辐射值") or ""),
+                    "剂量": parse_dose(record.get("辐射值")),
+                    "更新时间": updated,
+                    "来源": str(record.get("来源") or ""),
+                    "采集时间": crawl_time,
+                }
+                if row is None:
+                    row = index[name] = len(columns["监测点"])
+                    for field in STATE_FIELDS:
+                        columns[field].append(values[field])
+                else:
+                    for field in STATE_FIELDS:
+                        columns[field][row] = values[field]
+                changed += 1
+            view = LatestView(columns, base.version + 1, crawl_time)
+            self._save(view)
+            self.view = view
+        return changed
+
+    def seed(self, data_dir, file_prefix="辐射监测数据"):
+        """还没有快照文件时，从data/中最新的xlsx快照建立初始状态（需要pandas）；返回载入的监测点数"""
+        from history import list_snapshots, read_snapshot, snapshot_time
+
+        if len(self.view) or self.path.exists():
+            return 0
+        snapshots = list_snapshots(data_dir, file_prefix)
+        if not snapshots:
+            return 0
+        frame = read_snapshot(snapshots[-1])
+        records = frame.drop(columns=["采集时间", "剂量"], errors="ignore").astype(str).to_dict("records")
+        return self.update(records, snapshot_time(snapshots[-1]))
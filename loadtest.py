@@ -0,0 +1,317 @@
+"""
+模拟负载：本地假RMTC服务 + 压测驱动，用于调优抓取和寻找规模上限（不访问真实网站）。
+
+    python loadtest.py serve --stations 10000 --latency 0.2 --error-rate 0.05 --port 8765
+    python loadtest.py run --stations 100000 --rate 2 --duration 60
+    python loadtest.py run --url http://127.0.0.1:8765/gis/listtype0M.html --mode task
+
+serve：按模板生成 listtype0M.html 形状的页面，监测点数量（30~100k）、延迟、错误率、
+       ETag/304、慢速分块发送均可配置；每 publish_every 秒“发布”一次新数据。
+run：  未指定--url时在子进程中启动serve，再按固定速率发起抓取，
+       定期输出吞吐量、每次抓取的记录数、p50/p99延迟和本进程RSS。
+       mode=crawl 只执行适配器的 fetch+parse+normalise；
+       mode=task 在临时目录中执行完整的 fetch_data_task（不推送Git，礼貌延迟为0）；
+       同时进行的 fetch_data_task 会合并为一次抓取，该模式固定单并发，--workers 不生效。
+"""
+import os
+import sys
+import csv
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+PAGE_PATH = "/gis/listtype0M.html"
+PAGE_HEAD = ('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>全国辐射环境自动监测站空气吸收剂量率</title>'
+             '</head>\n<body>\n<div class="datalist">\n')
+PAGE_ITEM = ('<div class="datali">\n  <div class="divname">{name}</div>\n'
+             '  <div class="divval"><span>{dose} nGy/h</span><span>{date}</span></div>\n</div>\n')
+PAGE_TAIL = '</div>\n</body>\n</html>\n'
+
+
+def station_names(count):
+    """前31个取自随程序分发的stations.csv，其余按省份轮流生成"""
+    names = []
+    try:
+        with open(Path(__file__).resolve().parent / "stations.csv", 'r', encoding='utf-8-sig', newline='') as f:
+            names = [row["监测点"] for row in csv.DictReader(f)]
+    except Exception as e:
+        print(f"读取stations.csv失败：{e}")
+    provinces = [name.split(" (")[0] for name in names] or ["北京"]
+    for i in range(len(names), count):
+        names.append(f"{provinces[i % len(provinces)]} (模拟{i}站)")
+    return names[:count]
+
+
+class FakeRmtc:
+    """页面内容按“发布版本”缓存：同一版本内字节完全相同，ETag不变"""
+
+    def __init__(self, stations=31, publish_every=60, seed=0):
+        self.names = station_names(stations)
+        self.publish_every = publish_every
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._version = None
+        self._page = None
+
+    def page(self):
+        """返回 (etag, last_modified, body)"""
+        version = int(time.time() // self.publish_every) if self.publish_every > 0 else 0
+        with self._lock:
+            if version != self._version:
+                rng = random.Random(self.seed * 1000003 + version)
+                date = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+                body = (PAGE_HEAD + "".join(PAGE_ITEM.format(name=name, dose=rng.randint(50, 150), date=date)
+                                            for name in self.names) + PAGE_TAIL).encode('utf-8')
+                published = version * self.publish_every if self.publish_every > 0 else time.time()
+                self._page = (f'"{hashlib.md5(body).hexdigest()}"', formatdate(published, usegmt=True), body)
+                self._version = version
+            return self._page
+
+
+class FakeRmtcHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        opts = self.server.options
+        if self.path.split("?")[0] != PAGE_PATH:
+            self.send_error(404)
+            return
+        time.sleep(max(0.0, random.gauss(opts.latency, opts.jitter)) if opts.jitter else opts.latency)
+        if random.random() < opts.error_rate:
+            self.send_error(random.choice([500, 502, 503]))
+            return
+
+        etag, last_modified, body = self.server.fake.page()
+        if opts.etag and (self.headers.get("If-None-Match") == etag
+                          or self.headers.get("If-Modified-Since") == last_modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if opts.etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        # 慢速分块发送：drip秒内分chunks次写出
+        if opts.drip > 0 and opts.chunks > 1:
+            size = -(-len(body) // opts.chunks)
+            for i in range(0, len(body), size):
+                self.wfile.write(body[i:i + size])
+                self.wfile.flush()
+                time.sleep(opts.drip / opts.chunks)
+        else:
+            self.wfile.write(body)
+
+
+def serve(options):
+    server = ThreadingHTTPServer((options.host, options.port), FakeRmtcHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.fake = FakeRmtc(options.stations, options.publish_every, options.seed)
+    server.fake.page()
+    print(f"READY http://{options.host}:{server.server_address[1]}{PAGE_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ------------------------------
+# 压测驱动
+# ------------------------------
+def rss_mb():
+    """当前进程常驻内存（MB）；有psutil时用psutil，Linux读/proc，否则退回峰值RSS"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1048576
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1048576 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        return 0.0
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Stats:
+    """线程安全的结果汇总，按报告周期切分"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.window, self.total = [], []
+
+    def add(self, latency, ok, rows):
+        with self._lock:
+            self.window.append((latency, ok, rows))
+
+    def flush(self):
+        with self._lock:
+            window, self.window = self.window, []
+            self.total.extend(window)
+        return window
+
+
+def summarize(results, seconds):
+    latencies = [r[0] * 1000 for r in results]
+    ok = sum(1 for r in results if r[1])
+    rows = sum(r[2] for r in results) / len(results) if results else 0
+    return (f"完成{len(results):>5} 成功{ok:>5}  {len(results) / seconds if seconds else 0:6.2f} 次/秒  "
+            f"{rows:7.0f} 条/次  "
+            f"p50 {percentile(latencies, 50):8.1f} ms  p99 {percentile(latencies, 99):8.1f} ms  "
+            f"RSS {rss_mb():7.1f} MB")
+
+
+def make_job(mode, url):
+    """返回 job() -> (是否成功, 记录数)"""
+    import main as app
+
+    if mode == "crawl":
+        adapter = app.RmtcHtmlAdapter("load", {"url": url})
+
+        def job():
+            records = adapter.crawl(0, 0)
+            return bool(records), len(records)
+        return job
+
+    # 完整任务：临时目录中运行，数据/缓冲/状态都写在临时目录，不推送Git；模拟监测点不在stations.csv中，不检查未知监测点
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    os.chdir(workdir)
+    app.DATA_DIR.mkdir(exist_ok=True)
+    with open(app.CONFIG_PATH, 'w', encoding='utf-8') as f:
+        f.write(f"[CRAWLER]\ntarget_url = {url}\nrandom_delay = 0,0\n\n[GIT]\nenable_push = False\n\n"
+                f"[DIFF]\nenable = True\n\n[QUALITY]\nknown_stations =\n")
+    print(f"mode=task 工作目录：{workdir}")
+
+    def job():
+        lines = []
+        result = app.fetch_data_task(callback=lines.append, task_type="压测")
+        ok = bool(result.get("ok")) and not any("[错误]" in line for line in lines)
+        return ok, result.get("records", 0)
+    return job
+
+
+def run(options):
+    server = None
+    url = options.url
+    if not url:
+        args = [sys.executable, os.path.abspath(__file__), "serve", "--port", "0",
+                "--stations", str(options.stations), "--latency", str(options.latency),
+                "--jitter", str(options.jitter), "--error-rate", str(options.error_rate),
+                "--drip", str(options.drip), "--publish-every", str(options.publish_every)]
+        server = subprocess.Popen(args, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        line = server.stdout.readline().strip()
+        if not line.startswith("READY "):
+            print(f"假服务启动失败：{line}")
+            server.kill()
+            return 1
+        url = line.split(" ", 1)[1]
+    if options.mode == "task" and options.workers != 1:
+        # 并发的fetch_data_task会合并到进行中的抓取，等待者不是独立的一次抓取，计入结果会虚高吞吐量
+        print(f"mode=task 固定单并发（忽略 --workers {options.workers}）：同时进行的任务会合并为一次抓取")
+        options.workers = 1
+    print(f"目标：{url}  模式：{options.mode}  速率：{options.rate}/秒  并发：{options.workers}")
+
+    stats = Stats()
+    job = make_job(options.mode, url)
+
+    def timed():
+        start = time.perf_counter()
+        try:
+            ok, rows = job()
+        except Exception as e:
+            print(f"抓取异常：{e}")
+            ok, rows = False, 0
+        stats.add(time.perf_counter() - start, ok, rows)
+
+    start = last = time.perf_counter()
+    print(f"基线 RSS {rss_mb():.1f} MB")
+    try:
+        with ThreadPoolExecutor(max_workers=options.workers) as pool:
+            futures = []
+            # 固定速率发起（并发已满时在线程池中排队，延迟只计处理耗时）；到时后继续报告直至全部完成
+            while True:
+                now = time.perf_counter()
+                if now - start >= options.duration and all(f.done() for f in futures):
+                    break
+                if now - start < options.duration and start + len(futures) / options.rate <= now:
+                    futures.append(pool.submit(timed))
+                    continue
+                if now - last >= options.report_every:
+                    print(f"[{now - start:6.1f}s] {summarize(stats.flush(), now - last)}", flush=True)
+                    last = now
+                time.sleep(0.01)
+        stats.flush()
+        elapsed = time.perf_counter() - start
+        print(f"合计 {elapsed:.1f}s：{summarize(stats.total, elapsed)}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog="loadtest", description="假RMTC服务与抓取压测")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--stations", type=int, default=31, help="监测点数量（30~100000）")
+        p.add_argument("--latency", type=float, default=0.0, help="每个请求的响应延迟（秒）")
+        p.add_argument("--jitter", type=float, default=0.0, help="延迟的标准差（秒）")
+        p.add_argument("--error-rate", type=float, default=0.0, help="返回5xx的概率")
+        p.add_argument("--drip", type=float, default=0.0, help="慢速发送：正文分块发送的总耗时（秒）")
+        p.add_argument("--publish-every", type=float, default=60, help="每隔多少秒发布新数据（ETag变化）")
+    serve_parser, run_parser = sub.choices["serve"], sub.choices["run"]
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--chunks", type=int, default=20, help="慢速发送的分块数")
+    serve_parser.add_argument("--no-etag", dest="etag", action="store_false", help="不返回ETag/304")
+    serve_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--url", help="已在运行的服务地址；不填则自动启动serve")
+    run_parser.add_argument("--mode", choices=["crawl", "task"], default="crawl")
+    run_parser.add_argument("--rate", type=float, default=1.0, help="每秒发起的抓取次数")
+    run_parser.add_argument("--workers", type=int, default=4, help="最大并发抓取数（mode=task 固定为1）")
+    run_parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    run_parser.add_argument("--report-every", type=float, default=5, help="报告间隔（秒）")
+    options = parser.parse_args(argv)
+
+    if options.command == "serve":
+        serve(options)
+        return 0
+    return run(options)
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
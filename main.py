@@ -1,29 +1,57 @@
 import os
 import sys
 import time
+
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点（--profile-startup）
 import random
 import datetime
 import threading
+import warnings
+import multiprocessing
+import importlib
+import io
+import csv
+import json
 import subprocess
 import configparser
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import requests
-from bs4 import BeautifulSoup, Tag
-import pandas as pd
-from fake_useragent import UserAgent
-import warnings
+from tkinter import ttk, messagebox
+from tkinter import font as tkfont
 import gc
 
-# 忽略HTTPS证书警告
-warnings.filterwarnings("ignore", category=requests.packages.urllib3.exceptions.InsecureRequestWarning)
+from eventlog import EventLog, LEVELS, TASK_TYPES
+from history import HistoryStore, DOWNSAMPLERS, lttb
+from publish import publish_files, publish_data_branch, append_text_delta, ensure_lfs
+from profiling import StageTimer, importtime_summary
+from changeset import ChangeSetWriter
+from freshness import FreshnessTracker
+from spool import Spool, Publisher
+from jobs import JobCoordinator
+from latest import LatestState
 
 # 全局配置
 CONFIG = configparser.ConfigParser()
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 CONFIG_PATH = "config.ini"
+# 打包后随程序分发的只读资源（PyInstaller解压目录），源码运行时为脚本所在目录
+RESOURCE_DIR = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent))
+DEFAULT_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+# pandas/bs4/requests导入耗时较长，推迟到首次抓取时再加载，使窗口先完成绘制
+HEAVY_MODULES = ["requests", "bs4", "lxml", "pandas", "openpyxl"]
+_USER_AGENTS = None
+_CHANGESET_WRITER = None
+_FRESHNESS_TRACKER = None
+_SPOOL = None
+_PUBLISHER = None
+_JOB_COORDINATOR = None
+_TS_STORE = None
+_QUALITY_GATE = None
+_LATEST_STATE = None
 
 
 # ------------------------------
@@ -50,14 +78,66 @@ crawl_time = 10:00
 target_url = https://data.rmtc.org.cn/gis/listtype0M.html
 random_delay = 1,3
 file_prefix = 辐射监测数据
+max_workers = 4
+; 多数据源：sources = rmtc, backup_api，每个名称对应一个 [SOURCE 名称] 段；不填则只抓取target_url
+; [SOURCE backup_api]
+; type = json
+; url = https://example.com/api/radiation
+; records_path = data.items
+; field_map = 省份:province, 监测点:station, 辐射值:dose, 更新时间:updated
+; value_unit = nGy/h
 
 [GIT]
 commit_prefix = 自动更新：
 enable_push = True
 repo_url = https://github.com/你的用户名/你的仓库名.git  ; 远程仓库地址
+layout = main
+data_branch = data
+compact_every = 30
+keep_snapshots = 7
+text_dir = history
+text_format = csv
+lfs = False
 
 [LOG]
-log_max_lines = 100
+event_db = logs/events.db
+
+[CHART]
+downsample = lttb
+history_backend = snapshots
+tsstore_dir = state/tsstore
+
+[DIFF]
+enable = True
+changes_path = changes/changes.jsonl
+
+[SPOOL]
+dir = spool
+retry_base = 30
+retry_max = 3600
+
+[FRESHNESS]
+adaptive = False
+state_path = state/freshness.json
+window_minutes = 60
+fast_minutes = 10
+slow_minutes = 60
+fresh_ratio = 0.95
+
+[JOBS]
+db = state/jobs.db
+lease_seconds = 60
+wait_timeout = 600
+
+[QUALITY]
+enable = True
+db = state/quality.db
+known_stations = stations.csv
+units = nGy/h, μGy/h, nSv/h, μSv/h
+warn_only = 未知监测点
+
+[LATEST]
+path = state/latest.pkl
 """)
     CONFIG.read(CONFIG_PATH, encoding="utf-8")
     return CONFIG
@@ -66,16 +146,28 @@ log_max_lines = 100
 # ------------------------------
 # 2. 数据抓取与解析
 # ------------------------------
+def random_user_agent():
+    """从随程序分发的useragents.json随机取一个UA（只读取一次），读取失败时使用默认UA"""
+    global _USER_AGENTS
+    if _USER_AGENTS is None:
+        try:
+            with open(RESOURCE_DIR / "useragents.json", 'r', encoding='utf-8') as f:
+                _USER_AGENTS = [safe_str(ua) for ua in json.load(f) if safe_str(ua, "")] or [DEFAULT_UA]
+        except Exception as e:
+            print(f"读取UA列表失败：{safe_str(e)}")
+            _USER_AGENTS = [DEFAULT_UA]
+    return random.choice(_USER_AGENTS)
+
+
 def get_radiation_data(url, min_delay, max_delay):
     try:
+        import requests
+        from urllib3.exceptions import InsecureRequestWarning
+        # 忽略HTTPS证书警告
+        warnings.filterwarnings("ignore", category=InsecureRequestWarning)
+
         time.sleep(random.uniform(min_delay, max_delay))
-        # 安全获取User-Agent
-        try:
-            ua = UserAgent().random
-        except:
-            ua = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        ua = safe_str(ua)
-        headers = {"User-Agent": ua}
+        headers = {"User-Agent": random_user_agent()}
         
         response = requests.get(url, headers=headers, timeout=15, verify=False)
         response.raise_for_status()
@@ -88,14 +180,18 @@ def get_radiation_data(url, min_delay, max_delay):
         return None
 
 
-def parse_html(html_content):
+def parse_html(html_content, container_selector=".datali", name_class="divname",
+               value_class="divval", province_sep=" ("):
+    """解析列表页；页面布局参数可由数据源适配器覆盖，默认对应RMTC listtype页面"""
+    from bs4 import BeautifulSoup, Tag
+
     data = []
     html_content = safe_str(html_content)
     if html_content == "未知":
         return data
 
     soup = BeautifulSoup(html_content, 'lxml')
-    monitor_containers = soup.select('.datali')
+    monitor_containers = soup.select(container_selector)
     soup = None  # 释放内存
     html_content = None
 
@@ -115,7 +211,7 @@ def parse_html(html_content):
                 continue
 
             # 提取监测点名称
-            name_div_list = [d for d in child_divs if 'divname' in safe_str(d.get('class', []))]
+            name_div_list = [d for d in child_divs if name_class in safe_str(d.get('class', []))]
             station = "名称缺失"
             if name_div_list and isinstance(name_div_list[0], Tag):
                 station_text = name_div_list[0].get_text(strip=True)
@@ -123,7 +219,7 @@ def parse_html(html_content):
             name_div_list = None
 
             # 提取辐射值和时间
-            val_div_list = [d for d in child_divs if 'divval' in safe_str(d.get('class', []))]
+            val_div_list = [d for d in child_divs if value_class in safe_str(d.get('class', []))]
             radiation = "数值缺失"
             time_str = "时间缺失"
             if val_div_list and isinstance(val_div_list[0], Tag):
@@ -144,8 +240,8 @@ def parse_html(html_content):
 
             # 提取省份
             province = "省份未知"
-            if ' (' in station:
-                province = safe_str(station.split(' (')[0], "省份未知")
+            if province_sep and province_sep in station:
+                province = safe_str(station.split(province_sep)[0], "省份未知")
 
             data.append({
                 "省份": province,
@@ -167,15 +263,25 @@ def parse_html(html_content):
     return data
 
 
-def save_to_excel(data, file_prefix):
+def save_to_excel(data, file_prefix, filename=None):
+    """先写临时文件再rename，中途失败或进程退出都不会留下半个xlsx"""
     file_prefix = safe_str(file_prefix, "辐射监测数据")
     if not data or not isinstance(data, list):
         return None
     try:
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = DATA_DIR / f"{file_prefix}_{timestamp}.xlsx"
+        import pandas as pd
+
+        if filename is None:
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = DATA_DIR / f"{file_prefix}_{timestamp}.xlsx"
+        filename = Path(filename)
+        tmp_name = filename.with_name(f".{filename.name}.tmp")
         df = pd.DataFrame(data)
-        df.to_excel(safe_str(filename), index=False, sheet_name="辐射数据")
+        with open(tmp_name, 'wb') as f:
+            df.to_excel(f, index=False, sheet_name="辐射数据", engine="openpyxl")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, filename)
         df = None
         data = None
         gc.collect()
@@ -187,6 +293,159 @@ def save_to_excel(data, file_prefix):
         return None
 
 
+# ------------------------------
+# 2.1 数据源适配器（fetch + parse + normalise，由config.ini注册）
+# ------------------------------
+RECORD_FIELDS = ["省份", "监测点", "辐射值", "更新时间", "来源"]
+RECORD_DEFAULTS = {"省份": "省份未知", "监测点": "名称缺失", "辐射值": "数值缺失", "更新时间": "时间缺失"}
+
+
+def parse_field_map(text):
+    """解析 "监测点:station, 辐射值:dose" 形式的字段映射"""
+    mapping = {}
+    for item in safe_str(text, "").split(','):
+        if ':' not in item:
+            continue
+        target, source = item.split(':', 1)
+        if target.strip() and source.strip():
+            mapping[target.strip()] = source.strip()
+    return mapping
+
+
+class SourceAdapter(ABC):
+    """数据源适配器基类：fetch获取原始内容，parse拆成记录，normalise统一为RECORD_FIELDS；
+    子类必须实现parse，否则创建时即报错"""
+    kind = "base"
+
+    def __init__(self, name, options=None):
+        self.name = safe_str(name, self.kind)
+        self.options = dict(options or {})
+        self.url = safe_str(self.options.get("url", ""), "")
+        self.province_sep = self.options.get("province_sep", " (").strip('"')
+        self.field_map = parse_field_map(self.options.get("field_map", ""))
+
+    def fetch(self, min_delay, max_delay):
+        """http(s)地址走get_radiation_data，其他视为本地文件（离线数据、测试夹具）"""
+        if self.url.startswith(("http://", "https://")):
+            return get_radiation_data(self.url, min_delay, max_delay)
+        try:
+            encoding = safe_str(self.options.get("encoding", "utf-8"), "utf-8")
+            with open(self.url, 'r', encoding=encoding) as f:
+                return f.read()
+        except Exception as e:
+            print(f"读取本地数据源失败：{safe_str(e)}")
+            return None
+
+    @abstractmethod
+    def parse(self, raw):
+        """原始内容 -> 行字典列表（字段名见field_map）"""
+
+    def normalise(self, rows):
+        records = []
+        for row in rows:
+            record = {}
+            for field in RECORD_FIELDS[:-1]:
+                record[field] = safe_str(row.get(self.field_map.get(field, field)), RECORD_DEFAULTS[field])
+            if record["省份"] == "省份未知" and self.province_sep and self.province_sep in record["监测点"]:
+                record["省份"] = safe_str(record["监测点"].split(self.province_sep)[0], "省份未知")
+            unit = safe_str(self.options.get("value_unit", ""), "")
+            if unit and record["辐射值"].replace('.', '', 1).isdigit():
+                record["辐射值"] = f"{record['辐射值']} {unit}"
+            record["来源"] = self.name
+            records.append(record)
+        return records
+
+    def crawl(self, min_delay, max_delay):
+        raw = self.fetch(min_delay, max_delay)
+        if raw is None:
+            return []
+        return self.normalise(self.parse(raw))
+
+
+class RmtcHtmlAdapter(SourceAdapter):
+    """data.rmtc.org.cn listtype页面（.datali / divname / divval 布局）"""
+    kind = "rmtc_html"
+
+    def parse(self, raw):
+        return parse_html(
+            raw,
+            container_selector=self.options.get("container", ".datali"),
+            name_class=self.options.get("name_class", "divname"),
+            value_class=self.options.get("value_class", "divval"),
+            province_sep=self.province_sep,
+        )
+
+
+class JsonApiAdapter(SourceAdapter):
+    """JSON接口：records_path指定记录列表位置（如 data.items），field_map映射字段"""
+    kind = "json"
+
+    def parse(self, raw):
+        try:
+            node = json.loads(raw)
+        except ValueError as e:
+            print(f"JSON解析失败：{safe_str(e)}")
+            return []
+        for key in [k for k in safe_str(self.options.get("records_path", ""), "").split('.') if k]:
+            node = node.get(key) if isinstance(node, dict) else None
+        return [r for r in node if isinstance(r, dict)] if isinstance(node, list) else []
+
+
+class CsvAdapter(SourceAdapter):
+    """CSV导出文件：首行为表头，field_map映射字段"""
+    kind = "csv"
+
+    def parse(self, raw):
+        delimiter = safe_str(self.options.get("delimiter", ","), ",")
+        return list(csv.DictReader(io.StringIO(raw), delimiter=delimiter))
+
+
+SOURCE_TYPES = {cls.kind: cls for cls in (RmtcHtmlAdapter, JsonApiAdapter, CsvAdapter)}
+
+
+def load_adapters(config):
+    """按[CRAWLER] sources 列出的名称读取 [SOURCE 名称] 段；未配置时沿用 target_url"""
+    names = [n.strip() for n in safe_str(config.get("CRAWLER", "sources", fallback=""), "").split(',') if n.strip()]
+    if not names:
+        url = safe_str(config.get("CRAWLER", "target_url", fallback="https://data.rmtc.org.cn/gis/listtype0M.html"))
+        return [RmtcHtmlAdapter("rmtc", {"url": url})]
+
+    adapters = []
+    for name in names:
+        section = f"SOURCE {name}"
+        if not config.has_section(section):
+            print(f"数据源配置缺失：[{section}]")
+            continue
+        options = dict(config.items(section))
+        adapter_cls = SOURCE_TYPES.get(safe_str(options.get("type", "rmtc_html")))
+        if adapter_cls is None:
+            print(f"未知数据源类型：{options.get('type')}（{name}）")
+            continue
+        adapters.append(adapter_cls(name, options))
+    return adapters
+
+
+def crawl_sources(adapters, min_delay, max_delay, max_workers=4, log=None):
+    """并发抓取所有数据源，合并为同一批记录；单个数据源失败不影响其他数据源"""
+    data = []
+    if not adapters:
+        return data
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(adapters)))) as pool:
+        futures = {pool.submit(a.crawl, min_delay, max_delay): a for a in adapters}
+        for future in as_completed(futures):
+            adapter = futures[future]
+            try:
+                records = future.result()
+            except Exception as e:
+                records = []
+                if log:
+                    log(f"数据源[{adapter.name}]抓取异常：{safe_str(str(e)[:100])}", is_error=True)
+            if log:
+                log(f"数据源[{adapter.name}]解析{len(records)}条记录")
+            data.extend(records)
+    return data
+
+
 # ------------------------------
 # 3. Git操作（支持从ini读取仓库地址并自动关联）
 # ------------------------------
@@ -241,8 +500,9 @@ def ensure_git_repo(callback=None):
     return True
 
 
-def git_commit_push(file_path, commit_prefix, callback=None):
-    """增强版Git推送，依赖ini配置的仓库地址"""
+def git_commit_push(file_path, commit_prefix, callback=None, records=None, crawl_time=None):
+    """增强版Git推送，依赖ini配置的仓库地址；按[GIT] layout选择发布布局（见publish.py）；
+    crawl_time为该批数据的采集时间，text布局据此标记记录并避免重试时重复追加"""
     # 先确保仓库已初始化并关联远程（根据ini配置）
     if not ensure_git_repo(callback=callback):
         return False
@@ -259,34 +519,37 @@ def git_commit_push(file_path, commit_prefix, callback=None):
         return False
 
     try:
-        # 获取配置的仓库地址（用于日志显示）
+        # 获取配置的仓库地址（用于日志显示）及发布布局
         config = load_config()
         repo_url = safe_str(config.get("GIT", "repo_url", fallback="未知仓库"))
+        layout = safe_str(config.get("GIT", "layout", fallback="main"))
+        data_branch = safe_str(config.get("GIT", "data_branch", fallback="data"))
+        compact_every = config.getint("GIT", "compact_every", fallback=30)
+        keep_snapshots = config.getint("GIT", "keep_snapshots", fallback=7)
+        text_dir = safe_str(config.get("GIT", "text_dir", fallback="history"))
+        text_format = safe_str(config.get("GIT", "text_format", fallback="csv"))
+        use_lfs = config.getboolean("GIT", "lfs", fallback=False)
         config = None
 
-        # 执行Git命令
         commit_msg = f"{commit_prefix}{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        log_git(f"添加文件：{os.path.basename(file_path)}")
-        add_result = subprocess.run(['git', 'add', file_path], capture_output=True, text=True)
-        if add_result.stderr:
-            log_git(f"add错误：{add_result.stderr.strip()}")
-            return False
-
-        log_git(f"提交：{commit_msg}")
-        commit_result = subprocess.run(['git', 'commit', '-m', commit_msg], capture_output=True, text=True)
-        if commit_result.returncode != 0:
-            log_git(f"commit失败：{commit_result.stderr.strip() or '无新内容可提交'}")
-            return False
-
-        log_git(f"推送至远程仓库：{repo_url[:50]}...")
-        push_result = subprocess.run(['git', 'push', 'origin', 'main'], capture_output=True, text=True)
-        if push_result.stderr:
-            log_git(f"push错误：{push_result.stderr.strip()}")
-            return False
+        log_git(f"发布布局：{layout}，远程仓库：{repo_url[:50]}...")
+
+        if layout == "data_branch":
+            # 增量文件一起提交，压缩时删去的旧快照数据由它保留
+            text_file = append_text_delta(records, text_dir, fmt=text_format, crawl_time=crawl_time) if records else None
+            ok = publish_data_branch(file_path, commit_msg, branch=data_branch, compact_every=compact_every,
+                                     keep_snapshots=keep_snapshots, text_file=text_file, log=log_git)
+        elif layout == "text":
+            paths = [append_text_delta(records, text_dir, fmt=text_format, crawl_time=crawl_time)]
+            if use_lfs and ensure_lfs(["*.xlsx"], log=log_git):
+                paths += [".gitattributes", file_path]
+            ok = publish_files(paths, commit_msg, log=log_git)
+        else:
+            ok = publish_files([file_path], commit_msg, log=log_git)
 
-        log_git("Git推送成功")
-        return True
+        if ok:
+            log_git("Git推送成功")
+        return ok
 
     except Exception as e:
         log_git(f"操作异常：{safe_str(e)}")
@@ -296,67 +559,326 @@ def git_commit_push(file_path, commit_prefix, callback=None):
 # ------------------------------
 # 4. 定时任务与UI（显示仓库地址配置）
 # ------------------------------
+def get_changeset_writer(changes_path, file_prefix):
+    """进程内共用一个差异计算器，以便在内存中保留上一次快照"""
+    global _CHANGESET_WRITER
+    if _CHANGESET_WRITER is None or str(_CHANGESET_WRITER.changes_path) != str(Path(changes_path)):
+        _CHANGESET_WRITER = ChangeSetWriter(changes_path, data_dir=DATA_DIR, file_prefix=file_prefix)
+    return _CHANGESET_WRITER
+
+
+def get_freshness_tracker(config):
+    """进程内共用一个新鲜度跟踪器（状态持久化在[FRESHNESS] state_path）"""
+    global _FRESHNESS_TRACKER
+    if _FRESHNESS_TRACKER is None:
+        crawl_time = safe_str(config.get("CRAWLER", "crawl_time", fallback="10:00"))
+        try:
+            datetime.datetime.strptime(crawl_time, "%H:%M")
+        except ValueError:
+            crawl_time = "10:00"
+        _FRESHNESS_TRACKER = FreshnessTracker(
+            safe_str(config.get("FRESHNESS", "state_path", fallback="state/freshness.json")),
+            publish_time=crawl_time,
+            window_minutes=config.getint("FRESHNESS", "window_minutes", fallback=60),
+            fast_minutes=config.getint("FRESHNESS", "fast_minutes", fallback=10),
+            slow_minutes=config.getint("FRESHNESS", "slow_minutes", fallback=60),
+            fresh_ratio=config.getfloat("FRESHNESS", "fresh_ratio", fallback=0.95),
+        )
+    return _FRESHNESS_TRACKER
+
+
+def get_job_coordinator(config):
+    """进程内共用一个作业协调器；各进程通过[JOBS] db中的租约协调抓取与Git操作"""
+    global _JOB_COORDINATOR
+    if _JOB_COORDINATOR is None:
+        _JOB_COORDINATOR = JobCoordinator(
+            safe_str(config.get("JOBS", "db", fallback="state/jobs.db")),
+            lease_seconds=config.getint("JOBS", "lease_seconds", fallback=60),
+        )
+    return _JOB_COORDINATOR
+
+
+def get_ts_store(config):
+    """进程内共用一个时间序列存储（numpy较重，首次使用时才导入）；写入时持有tsstore租约"""
+    global _TS_STORE
+    if _TS_STORE is None:
+        from tsstore import TimeSeriesStore
+
+        _TS_STORE = TimeSeriesStore(
+            safe_str(config.get("CHART", "tsstore_dir", fallback="state/tsstore")),
+            data_dir=DATA_DIR,
+            file_prefix=safe_str(config.get("CRAWLER", "file_prefix", fallback="辐射监测数据")),
+            guard=partial(get_job_coordinator(config).lease, "tsstore"),
+        )
+    return _TS_STORE
+
+
+def get_quality_gate(config):
+    """进程内共用一个质量校验环节；已知监测点表只读取一次"""
+    global _QUALITY_GATE
+    if _QUALITY_GATE is None:
+        from quality import QualityGate, RULES, load_station_names
+
+        known = None
+        known_path = safe_str(config.get("QUALITY", "known_stations", fallback="stations.csv"), "")
+        if known_path:
+            path = Path(known_path)
+            if not path.is_absolute() and not path.exists():
+                path = RESOURCE_DIR / path
+            try:
+                known = load_station_names(path)
+            except OSError as e:
+                print(f"读取已知监测点表失败，不检查未知监测点：{e}")
+        units = [u.strip() for u in safe_str(config.get("QUALITY", "units", fallback="nGy/h"), "").split(',')]
+        warn_only = [r.strip() for r in safe_str(config.get("QUALITY", "warn_only", fallback="未知监测点"), "").split(',')]
+        _QUALITY_GATE = QualityGate(
+            safe_str(config.get("QUALITY", "db", fallback="state/quality.db")),
+            known_stations=known,
+            units=[u for u in units if u],
+            warn_only=[r for r in warn_only if r in RULES],
+        )
+    return _QUALITY_GATE
+
+
+def get_latest_state(config):
+    """进程内共用一份最新状态；读者直接取 .view，无需加锁"""
+    global _LATEST_STATE
+    if _LATEST_STATE is None:
+        _LATEST_STATE = LatestState(safe_str(config.get("LATEST", "path", fallback="state/latest.pkl")))
+    return _LATEST_STATE
+
+
+def get_spool(config):
+    global _SPOOL
+    if _SPOOL is None:
+        _SPOOL = Spool(safe_str(config.get("SPOOL", "dir", fallback="spool")),
+                       guard=partial(get_job_coordinator(config).lease, "spool"))
+    return _SPOOL
+
+
+def publish_job(job, batch, log=None):
+    """持有git租约发布一项，各进程的Git操作依次执行；共用同一缓冲时已被其他进程发布的项直接视为完成"""
+    config = load_config()
+    coordinator = get_job_coordinator(config)
+    timeout = config.getint("JOBS", "wait_timeout", fallback=600)
+    spool = get_spool(config)
+    config = None
+
+    def on_wait(holder):
+        if log:
+            log(f"[发布] 等待其他Git操作完成（{safe_str(holder.get('owner'))}）")
+
+    try:
+        with coordinator.lease("git", timeout=timeout, on_wait=on_wait):
+            if job.get("id") not in {pending["id"] for pending in spool.pending()}:
+                if log:
+                    log(f"[发布] {os.path.basename(safe_str(job.get('file')))}已由其他进程发布")
+                return True
+            # 在释放租约前标记完成，否则其他进程可能在间隙中取得租约并重复发布
+            ok = _publish_job(job, batch, log)
+            if ok:
+                spool.mark_done(job["id"])
+            return ok
+    except TimeoutError as e:
+        if log:
+            log(f"[发布] {safe_str(e)}", is_error=True)
+        return False
+
+
+def _publish_job(job, batch, log=None):
+    """发布一项：xlsx缺失时由缓冲中的批次重新生成，再按配置推送；返回True表示完成"""
+    file_path = safe_str(job.get("file"))
+    records = batch["records"] if batch else None
+    if not os.path.exists(file_path):
+        if not records:
+            if log:
+                log(f"[发布] {os.path.basename(file_path)}及其缓冲批次均不存在，跳过", is_error=True)
+            return True
+        if save_to_excel(records, job.get("file_prefix"), filename=file_path) is None:
+            if log:
+                log(f"[发布] 重新生成{os.path.basename(file_path)}失败", is_error=True)
+            return False
+        if log:
+            log(f"[发布] 已由缓冲批次重新生成：{os.path.basename(file_path)}")
+    if not job.get("git"):
+        return True
+    try:
+        crawl_time = datetime.datetime.strptime(safe_str(job.get("id"))[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        crawl_time = None
+    return git_commit_push(file_path, job.get("commit_prefix"), callback=log, records=records, crawl_time=crawl_time)
+
+
+def get_publisher(config, callback=None):
+    """进程内唯一的后台发布线程；首次创建时即重放日志中未完成的发布项"""
+    global _PUBLISHER
+    if _PUBLISHER is None:
+        def log(msg, is_error=False):
+            if callback and callable(callback):
+                callback(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {'[错误]' if is_error else ''} {safe_str(msg)}")
+
+        spool = get_spool(config)
+        pending = spool.compact()
+        if pending:
+            log(f"发现{pending}项未完成的发布，后台重试中")
+        _PUBLISHER = Publisher(
+            spool, partial(publish_job, log=log), log=log,
+            base_delay=config.getint("SPOOL", "retry_base", fallback=30),
+            max_delay=config.getint("SPOOL", "retry_max", fallback=3600),
+        ).start()
+    return _PUBLISHER
+
+
 def fetch_data_task(callback=None, task_type="定时"):
+    """抓取一次并返回结果摘要；已有抓取在进行（本进程或其他进程）时不重复抓取，等待并共用其结果"""
     def log(msg, is_error=False):
         if callback and callable(callback):
             msg_str = safe_str(msg, "未知日志")
             callback(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {'[错误]' if is_error else ''} {msg_str}")
 
+    waited = []
+
+    def on_wait(holder):
+        waited.append(holder)
+        started = (datetime.datetime.fromtimestamp(holder["created"]).strftime('%H:%M:%S')
+                   if holder.get("created") else "未知时间")
+        log(f"已有{safe_str(holder.get('requested_by'), '')}抓取任务进行中（{started}开始，"
+            f"{safe_str(holder.get('owner'))}），等待其结果")
+
+    try:
+        config = load_config()
+        coordinator = get_job_coordinator(config)
+        timeout = config.getint("JOBS", "wait_timeout", fallback=600)
+        config = None
+        result = coordinator.run("crawl", partial(_crawl_once, log, task_type, callback), requested_by=task_type,
+                                 timeout=timeout, on_wait=on_wait)
+    except Exception as e:
+        log(f"{task_type}任务异常：{safe_str(str(e)[:100])}", is_error=True)
+        return {"ok": False, "records": 0, "file": None}
+    if waited:
+        log(f"已合并到进行中的抓取任务：{'成功' if result.get('ok') else '失败'}，{result.get('records', 0)}条记录"
+            f"{'，' + result['file'] if result.get('file') else ''}", is_error=not result.get("ok"))
+    return result
+
+
+def _crawl_once(log, task_type, callback=None):
+    """实际的抓取流程（由作业协调器调度），返回可JSON序列化的结果摘要"""
     log(f"=== 开始{task_type}抓取任务 ===")
     try:
         config = load_config()
-        url = safe_str(config.get("CRAWLER", "target_url", fallback="https://data.rmtc.org.cn/gis/listtype0M.html"))
+        adapters = load_adapters(config)
+        max_workers = config.getint("CRAWLER", "max_workers", fallback=4)
         delay_str = safe_str(config.get("CRAWLER", "random_delay", fallback="1,3"))
         file_prefix = safe_str(config.get("CRAWLER", "file_prefix", fallback="辐射监测数据"))
         git_enable = config.getboolean("GIT", "enable_push", fallback=True)
         git_prefix = safe_str(config.get("GIT", "commit_prefix", fallback="自动更新："))
+        adaptive = config.getboolean("FRESHNESS", "adaptive", fallback=False)
+        tracker = get_freshness_tracker(config)
+        diff_enable = config.getboolean("DIFF", "enable", fallback=True)
+        changes_path = safe_str(config.get("DIFF", "changes_path", fallback="changes/changes.jsonl"))
+        quality_gate = get_quality_gate(config) if config.getboolean("QUALITY", "enable", fallback=True) else None
+        latest_state = get_latest_state(config)
+        ts_store = get_ts_store(config) if safe_str(config.get("CHART", "history_backend", fallback="snapshots")) == "tsstore" else None
+        spool = get_spool(config)
+        publisher = get_publisher(config, callback)
         config = None
 
         # 解析延迟参数
         delay_list = [safe_str(d) for d in delay_str.split(',')]
         min_delay = int(delay_list[0]) if len(delay_list)>=1 and delay_list[0].isdigit() else 1
         max_delay = int(delay_list[1]) if len(delay_list)>=2 and delay_list[1].isdigit() else 3
-        min_delay, max_delay = max(1, min_delay), max(min_delay, max_delay)
+        min_delay, max_delay = max(0, min_delay), max(min_delay, max_delay)
 
-        # 1. 获取网页
-        log(f"请求URL：{url[:50]}...")
-        html = get_radiation_data(url, min_delay, max_delay)
-        if html == "未知":
-            log(f"{task_type}抓取失败：无法获取网页", is_error=True)
-            gc.collect()
-            return
-
-        # 2. 解析数据
-        log("解析数据中...")
-        data = parse_html(html)
-        html = None
+        # 1. 并发获取并解析各数据源
+        for adapter in adapters:
+            log(f"数据源[{adapter.name}]（{adapter.kind}）：{adapter.url[:50]}...")
+        data = crawl_sources(adapters, min_delay, max_delay, max_workers=max_workers, log=log)
+        adapters = None
         if not data:
             log(f"{task_type}抓取失败：未找到有效监测数据", is_error=True)
             gc.collect()
-            return
+            return {"ok": False, "records": 0, "file": None}
         log(f"成功解析{len(data)}条监测点数据")
 
-        # 3. 保存数据
+        # 整批校验，不合格的行转入隔离表，只保存通过的记录
+        if quality_gate is not None:
+            from quality import describe
+
+            data, metrics = quality_gate.check(data, task_type)
+            log(f"数据质量：{describe(metrics)}", is_error=metrics["quarantined"] > 0)
+            if not data:
+                log(f"{task_type}抓取失败：全部记录未通过校验（python quality.py quarantine --run {metrics['run_id']}）",
+                    is_error=True)
+                gc.collect()
+                return {"ok": False, "records": 0, "file": None}
+
+        # 按“更新时间”跟踪各监测点的新鲜度；自适应轮询时源站未发布新数据则不重复保存
+        fresh = tracker.update(data)
+        log(f"数据新鲜度：{fresh['index']:.1%}（{fresh['current']}/{fresh['total']}，"
+            f"预期日期{fresh['expected']}），本次更新{fresh['updated']}个监测点")
+        if adaptive and task_type == "定时" and fresh["updated"] == 0:
+            log("源站数据未更新，跳过保存与推送")
+            log(f"=== {task_type}抓取任务完成 ===")
+            return {"ok": True, "records": len(data), "file": None}
+
+        # 时间序列存储在保存本次快照之前回填已有快照，本次数据在第4步写入
+        if ts_store is not None:
+            try:
+                imported = ts_store.backfill(log=log)
+                if imported:
+                    log(f"时间序列存储：已导入{imported}个历史快照")
+            except Exception as e:
+                log(f"时间序列存储回填失败：{safe_str(str(e)[:100])}", is_error=True)
+
+        # 2. 先写入缓冲并登记发布项，再保存数据；持有缓冲锁期间发布线程和退出流程都会等待
         log("保存数据中...")
-        file_path = save_to_excel(data, file_prefix)
-        data = None
-        if file_path == "未知":
-            log(f"{task_type}抓取失败：数据保存失败", is_error=True)
-            gc.collect()
-            return
-        log(f"数据保存路径：{os.path.basename(file_path)}")
+        with spool.lock:
+            batch_id = spool.write_batch(data, file_prefix=file_prefix)
+            file_path = str(DATA_DIR / f"{file_prefix}_{batch_id[:15]}.xlsx")
+            spool.enqueue(batch_id, file=file_path, file_prefix=file_prefix, git=git_enable, commit_prefix=git_prefix)
+            saved = save_to_excel(data, file_prefix, filename=file_path)
+        if saved is None:
+            log("数据保存失败，批次已写入缓冲，由后台发布线程重试", is_error=True)
+        else:
+            log(f"数据保存路径：{os.path.basename(file_path)}")
+
+        # 3. 与上一快照比对，写出增量变更记录
+        if diff_enable:
+            try:
+                change = get_changeset_writer(changes_path, file_prefix).apply(data, os.path.basename(file_path))
+                log(f"快照变更：新增{len(change['added'])} 删除{len(change['removed'])} "
+                    f"变化{len(change['changed'])} 未变{change['unchanged']}")
+            except Exception as e:
+                log(f"快照比对失败：{safe_str(str(e)[:100])}", is_error=True)
+
+        # 4. 追加到时间序列存储（采集时间取批次号中的时间戳）
+        crawl_time = datetime.datetime.strptime(batch_id[:15], "%Y%m%d_%H%M%S")
+        if ts_store is not None:
+            try:
+                log(f"时间序列存储：写入{ts_store.append(data, crawl_time)}个数据点")
+            except Exception as e:
+                log(f"写入时间序列存储失败：{safe_str(str(e)[:100])}", is_error=True)
+
+        # 5. 更新内存中的最新状态（写时复制，同时落盘快照）
+        try:
+            log(f"最新状态：更新{latest_state.update(data, crawl_time)}个监测点，共{len(latest_state.view)}个")
+        except Exception as e:
+            log(f"更新最新状态失败：{safe_str(str(e)[:100])}", is_error=True)
 
-        # 4. Git推送（使用ini配置的仓库地址）
+        # 6. 交给后台发布线程（Git推送使用ini配置的仓库地址），不阻塞抓取
+        publisher.notify()
         if git_enable:
-            log("准备推送至Git仓库...")
-            if not git_commit_push(file_path, git_prefix, callback=log):
-                log("Git推送失败（详情见上方[Git]日志）", is_error=True)
+            log(f"已加入发布队列（待发布{len(spool.pending())}项）")
         else:
             log("Git推送已禁用（可在config.ini中开启）")
 
+        result = {"ok": saved is not None, "records": len(data), "file": os.path.basename(file_path)}
+        data = None
         log(f"=== {task_type}抓取任务完成 ===")
+        return result
     except Exception as e:
         log(f"{task_type}任务异常：{safe_str(str(e)[:100])}", is_error=True)
+        return {"ok": False, "records": 0, "file": None}
     finally:
         gc.collect()
 
@@ -368,18 +890,38 @@ class CrawlerUI:
         self.root.geometry("900x650")  # 增加高度以显示仓库地址
         self.stop_event = threading.Event()
         self.schedule_thread = None
+        config = load_config()
+        self.event_log = EventLog(safe_str(config.get("LOG", "event_db", fallback="logs/events.db")))
+        config = None
+        self._log_filters = {"min_id": self.event_log.last_id()}  # 启动时只显示本次运行的事件
+        self._log_total = self.event_log.count(**self._log_filters)
+        self._log_offset = 0
+        self._log_rows = 20
+        self._log_follow = True
+        self._log_dirty = True
+        self._log_lock = threading.Lock()
         self._init_ui()
+        get_publisher(load_config(), partial(self._log, task_type="系统"))  # 重放上次未完成的发布
         self._start_schedule()
         self._refresh_config()
 
     def _init_ui(self):
+        notebook = ttk.Notebook(self.root)
+        notebook.pack(fill=tk.BOTH, expand=True)
+        run_tab = ttk.Frame(notebook)
+        notebook.add(run_tab, text="运行")
+        chart_tab = ttk.Frame(notebook)
+        notebook.add(chart_tab, text="历史曲线")
+        self._init_chart_tab(chart_tab)
+
         # 配置显示区（新增仓库地址显示）
-        config_frame = ttk.LabelFrame(self.root, text="当前配置", padding=(10,5))
+        config_frame = ttk.LabelFrame(run_tab, text="当前配置", padding=(10,5))
         config_frame.pack(fill=tk.X, padx=10, pady=5)
         self.config_vars = {
             "crawl_time": tk.StringVar(), "target_url": tk.StringVar(),
             "random_delay": tk.StringVar(), "git_status": tk.StringVar(),
-            "repo_url": tk.StringVar()  # 新增仓库地址变量
+            "repo_url": tk.StringVar(),  # 新增仓库地址变量
+            "freshness": tk.StringVar(), "next_run": tk.StringVar(), "latest": tk.StringVar()
         }
         # 配置网格布局（增加一行显示仓库地址）
         ttk.Label(config_frame, text="定时时间：").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
@@ -397,21 +939,182 @@ class CrawlerUI:
         ttk.Label(config_frame, text="仓库地址：").grid(row=4, column=0, sticky=tk.W, padx=5, pady=2)
         ttk.Label(config_frame, textvariable=self.config_vars["repo_url"], font=("Consolas", 9)).grid(row=4, column=1, sticky=tk.W, pady=2)
 
+        ttk.Label(config_frame, text="数据新鲜度：").grid(row=5, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(config_frame, textvariable=self.config_vars["freshness"]).grid(row=5, column=1, sticky=tk.W, pady=2)
+
+        ttk.Label(config_frame, text="下次抓取：").grid(row=6, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(config_frame, textvariable=self.config_vars["next_run"]).grid(row=6, column=1, sticky=tk.W, pady=2)
+
+        ttk.Label(config_frame, text="最新读数：").grid(row=7, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(config_frame, textvariable=self.config_vars["latest"]).grid(row=7, column=1, sticky=tk.W, pady=2)
+
         # 操作按钮区
-        btn_frame = ttk.Frame(self.root, padding=(10,5))
+        btn_frame = ttk.Frame(run_tab, padding=(10,5))
         btn_frame.pack(fill=tk.X, padx=10, pady=5)
         self.crawl_btn = ttk.Button(btn_frame, text="手动执行抓取", command=self._manual_crawl)
         self.crawl_btn.pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="打开配置文件", command=self._open_config).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="清空日志", command=self._clear_log).pack(side=tk.RIGHT, padx=5)
 
-        # 日志显示区
-        log_frame = ttk.LabelFrame(self.root, text="操作日志", padding=(10,5))
+        # 日志显示区（事件落盘至SQLite，只渲染可见窗口）
+        log_frame = ttk.LabelFrame(run_tab, text="操作日志", padding=(10,5))
         log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        self.log_text = scrolledtext.ScrolledText(log_frame, font=("Consolas", 10), bg="#2c3e50", fg="#ecf0f1")
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        filter_frame = ttk.Frame(log_frame)
+        filter_frame.pack(fill=tk.X, padx=5)
+        self.log_filter_vars = {
+            "level": tk.StringVar(value="全部"), "task_type": tk.StringVar(value="全部"),
+            "date": tk.StringVar(), "keyword": tk.StringVar()
+        }
+        ttk.Label(filter_frame, text="级别：").pack(side=tk.LEFT)
+        ttk.Combobox(filter_frame, textvariable=self.log_filter_vars["level"], values=["全部"] + LEVELS,
+                     width=6, state="readonly").pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="任务：").pack(side=tk.LEFT)
+        ttk.Combobox(filter_frame, textvariable=self.log_filter_vars["task_type"], values=["全部"] + TASK_TYPES,
+                     width=6, state="readonly").pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="日期：").pack(side=tk.LEFT)
+        ttk.Entry(filter_frame, textvariable=self.log_filter_vars["date"], width=11).pack(side=tk.LEFT, padx=(0, 8))
+        ttk.Label(filter_frame, text="关键字：").pack(side=tk.LEFT)
+        keyword_entry = ttk.Entry(filter_frame, textvariable=self.log_filter_vars["keyword"], width=16)
+        keyword_entry.pack(side=tk.LEFT, padx=(0, 8))
+        keyword_entry.bind("<Return>", lambda e: self._apply_log_filter())
+        ttk.Button(filter_frame, text="查询历史", command=self._apply_log_filter).pack(side=tk.LEFT)
+        self.log_count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.log_count_var).pack(side=tk.RIGHT)
+
+        text_frame = ttk.Frame(log_frame)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.log_scroll = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self._on_log_scroll)
+        self.log_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.log_text = tk.Text(text_frame, font=("Consolas", 10), bg="#2c3e50", fg="#ecf0f1", wrap=tk.NONE)
+        self.log_text.pack(fill=tk.BOTH, expand=True)
         self.log_text.config(state=tk.DISABLED)
         self.log_text.tag_configure("error", foreground="#e74c3c")
+        self.log_text.bind("<Configure>", self._on_log_resize)
+        self.log_text.bind("<MouseWheel>", lambda e: self._on_log_scroll("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.log_text.bind("<Button-4>", lambda e: self._on_log_scroll("scroll", -1, "units"))
+        self.log_text.bind("<Button-5>", lambda e: self._on_log_scroll("scroll", 1, "units"))
+        self.root.after(200, self._poll_log)
+
+    def _init_chart_tab(self, parent):
+        """历史曲线：序列在后台线程加载并按站缓存，主线程只绘制降采样后的点"""
+        config = load_config()
+        file_prefix = safe_str(config.get("CRAWLER", "file_prefix", fallback="辐射监测数据"))
+        self.downsample = DOWNSAMPLERS.get(safe_str(config.get("CHART", "downsample", fallback="lttb")), lttb)
+        if safe_str(config.get("CHART", "history_backend", fallback="snapshots")) == "tsstore":
+            # 时间序列存储依赖numpy，首次扫描历史数据时才在后台线程中创建
+            self.history = None
+        else:
+            self.history = HistoryStore(DATA_DIR, file_prefix)
+        config = None
+        self.chart_pool = ThreadPoolExecutor(max_workers=1)
+        self.chart_request = 0
+        self.chart_series = None
+
+        ctrl_frame = ttk.Frame(parent, padding=(10, 5))
+        ctrl_frame.pack(fill=tk.X)
+        self.chart_kind = tk.StringVar(value="监测点")
+        for kind in ("监测点", "省份"):
+            ttk.Radiobutton(ctrl_frame, text=kind, value=kind, variable=self.chart_kind,
+                            command=self._reload_chart_names).pack(side=tk.LEFT, padx=(0, 5))
+        self.chart_name = tk.StringVar()
+        self.chart_combo = ttk.Combobox(ctrl_frame, textvariable=self.chart_name, width=36, state="readonly")
+        self.chart_combo.pack(side=tk.LEFT, padx=5)
+        self.chart_combo.bind("<<ComboboxSelected>>", lambda e: self._load_chart_series())
+        ttk.Button(ctrl_frame, text="刷新数据", command=self._reload_chart_names).pack(side=tk.LEFT, padx=5)
+        self.chart_status = tk.StringVar(value="切换到此页后加载历史数据")
+        ttk.Label(ctrl_frame, textvariable=self.chart_status).pack(side=tk.RIGHT)
+
+        self.chart_canvas = tk.Canvas(parent, bg="#2c3e50", highlightthickness=0)
+        self.chart_canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.chart_canvas.bind("<Configure>", lambda e: self._draw_chart())
+        parent.bind("<Map>", lambda e: self.chart_combo["values"] or self._reload_chart_names())
+
+    def _run_in_chart_pool(self, func, on_done):
+        """后台执行func，完成后在主线程回调on_done(结果)；过期请求的结果直接丢弃"""
+        self.chart_request += 1
+        request = self.chart_request
+        future = self.chart_pool.submit(func)
+
+        def poll():
+            if self.stop_event.is_set():
+                return
+            if not future.done():
+                self.root.after(50, poll)
+            elif request == self.chart_request:
+                try:
+                    on_done(future.result())
+                except Exception as e:
+                    self.chart_status.set(f"加载失败：{safe_str(str(e)[:60])}")
+        self.root.after(50, poll)
+
+    def _reload_chart_names(self):
+        kind = self.chart_kind.get()
+        self.chart_status.set("正在扫描历史数据...")
+
+        def load():
+            if self.history is None:
+                self.history = get_ts_store(load_config())
+            self.history.refresh()
+            return self.history.names(kind)
+
+        def done(names):
+            self.chart_combo["values"] = names
+            if names and self.chart_name.get() not in names:
+                self.chart_name.set(names[0])
+            self.chart_status.set(f"共{len(names)}个{kind}")
+            if names:
+                self._load_chart_series()
+        self._run_in_chart_pool(load, done)
+
+    def _load_chart_series(self):
+        kind, name = self.chart_kind.get(), self.chart_name.get()
+        if not name:
+            return
+        self.chart_status.set(f"加载 {name} ...")
+
+        def done(series):
+            self.chart_series = (name, series)
+            self._draw_chart()
+        self._run_in_chart_pool(lambda: self.history.series(kind, name), done)
+
+    def _draw_chart(self):
+        canvas = self.chart_canvas
+        canvas.delete("all")
+        if not self.chart_series:
+            return
+        start = time.perf_counter()
+        name, (x, y) = self.chart_series
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        pad_left, pad_right, pad_y = 60, 20, 30
+        plot_w, plot_h = width - pad_left - pad_right, height - 2 * pad_y
+        if len(x) == 0 or plot_w < 10 or plot_h < 10:
+            self.chart_status.set(f"{name}：无数据")
+            return
+
+        dx, dy = self.downsample(x, y, max(3, plot_w))
+        x_min, x_max = float(x[0]), float(x[-1])
+        y_min, y_max = float(dy.min()), float(dy.max())
+        x_span, y_span = (x_max - x_min) or 1.0, (y_max - y_min) or 1.0
+        px = pad_left + (dx - x_min) / x_span * plot_w
+        py = pad_y + (1 - (dy - y_min) / y_span) * plot_h
+
+        canvas.create_rectangle(pad_left, pad_y, pad_left + plot_w, pad_y + plot_h, outline="#7f8c8d")
+        if len(px) > 1:
+            coords = [v for pair in zip(px.tolist(), py.tolist()) for v in pair]
+            canvas.create_line(*coords, fill="#1abc9c", width=1.5)
+        else:
+            canvas.create_oval(px[0] - 3, py[0] - 3, px[0] + 3, py[0] + 3, fill="#1abc9c", outline="")
+        label = {"fill": "#ecf0f1", "font": ("Consolas", 9)}
+        canvas.create_text(pad_left - 5, pad_y, text=f"{y_max:.0f}", anchor=tk.E, **label)
+        canvas.create_text(pad_left - 5, pad_y + plot_h, text=f"{y_min:.0f}", anchor=tk.E, **label)
+        canvas.create_text(pad_left - 5, pad_y - 15, text="nGy/h", anchor=tk.E, **label)
+        for value, anchor in ((x_min, tk.NW), (x_max, tk.NE)):
+            stamp = datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc).strftime('%Y-%m-%d %H:%M')
+            canvas.create_text(pad_left + (plot_w if anchor == tk.NE else 0), pad_y + plot_h + 5,
+                               text=stamp, anchor=anchor, **label)
+        cost = (time.perf_counter() - start) * 1000
+        self.chart_status.set(f"{name}：{len(x)}点 → 绘制{len(dx)}点，{cost:.0f} ms")
 
     def _refresh_config(self):
         try:
@@ -423,12 +1126,25 @@ class CrawlerUI:
             target_url = safe_str(config.get("CRAWLER", "target_url", fallback="未知"))
             random_delay = safe_str(config.get("CRAWLER", "random_delay", fallback="1,3"))
             git_status = "启用" if config.getboolean("GIT", "enable_push", fallback=True) else "禁用"
+            adaptive = config.getboolean("FRESHNESS", "adaptive", fallback=False)
+            fresh = get_freshness_tracker(config).summary()
+            latest = get_latest_state(config).refresh().summary()
             
             self.config_vars["repo_url"].set(f"{repo_url[:60]}..." if repo_url else "未配置...")
-            self.config_vars["crawl_time"].set(crawl_time)
+            self.config_vars["crawl_time"].set(f"{crawl_time}（自适应轮询，仅用作发布时间的初始估计）" if adaptive else crawl_time)
             self.config_vars["target_url"].set(f"{target_url[:50]}..." if target_url != "未知" else "未知...")
             self.config_vars["random_delay"].set(f"{random_delay} 秒")
             self.config_vars["git_status"].set(git_status)
+            self.config_vars["freshness"].set(
+                f"{fresh['index']:.1%}（{fresh['current']}/{fresh['total']}，预期日期{fresh['expected']}）"
+                f"{'，自适应轮询' if adaptive else ''}")
+            if latest["stations"]:
+                top = latest["max"]
+                top_text = f"，最高 {top['监测点']} {top['辐射值']}" if top else ""
+                self.config_vars["latest"].set(
+                    f"{latest['stations']}个监测点/{latest['provinces']}个省份，更新至{latest['updated']}{top_text}")
+            else:
+                self.config_vars["latest"].set("暂无（首次抓取后生成）")
             config = None
         except Exception as e:
             self._log(f"配置刷新失败：{safe_str(e)}", is_error=True)
@@ -441,16 +1157,23 @@ class CrawlerUI:
                 try:
                     config = load_config()
                     crawl_time = safe_str(config.get("CRAWLER", "crawl_time", fallback="10:00"))
+                    adaptive = config.getboolean("FRESHNESS", "adaptive", fallback=False)
+                    tracker = get_freshness_tracker(config)
                     config = None
                     
                     now = datetime.datetime.now()
-                    try:
-                        target_time = datetime.datetime.strptime(f"{now.date()} {crawl_time}", "%Y-%m-%d %H:%M")
-                    except ValueError:
-                        target_time = now + datetime.timedelta(minutes=5)
-                        self._log("时间格式错误（应为HH:MM），5分钟后重试", is_error=True)
-                    if now >= target_time:
-                        target_time += datetime.timedelta(days=1)
+                    if adaptive:
+                        # 按源站发布规律安排：发布窗口内快速轮询，数据到齐后退避到下一窗口
+                        target_time = tracker.next_poll(now)
+                    else:
+                        try:
+                            target_time = datetime.datetime.strptime(f"{now.date()} {crawl_time}", "%Y-%m-%d %H:%M")
+                        except ValueError:
+                            target_time = now + datetime.timedelta(minutes=5)
+                            self._log("时间格式错误（应为HH:MM），5分钟后重试", is_error=True)
+                        if now >= target_time:
+                            target_time += datetime.timedelta(days=1)
+                    self.config_vars["next_run"].set(target_time.strftime('%Y-%m-%d %H:%M'))
                     self._log(f"定时任务启动，下次执行：{target_time.strftime('%Y-%m-%d %H:%M')}")
                     
                     # 非阻塞等待
@@ -461,7 +1184,7 @@ class CrawlerUI:
                         remaining_seconds -= sleep_time
                     
                     if not self.stop_event.is_set():
-                        fetch_data_task(callback=self._log, task_type="定时")
+                        fetch_data_task(callback=partial(self._log, task_type="定时"), task_type="定时")
                 except Exception as e:
                     self._log(f"定时任务异常：{safe_str(str(e)[:80])}", is_error=True)
                     for _ in range(120):
@@ -480,7 +1203,7 @@ class CrawlerUI:
         self.crawl_btn.config(state=tk.DISABLED)
         
         def run():
-            fetch_data_task(callback=self._log, task_type="手动")
+            fetch_data_task(callback=partial(self._log, task_type="手动"), task_type="手动")
             self.crawl_btn.config(state=tk.NORMAL)
             gc.collect()
         
@@ -498,47 +1221,170 @@ class CrawlerUI:
             self._log(f"打开配置失败：{safe_str(e)}", is_error=True)
 
     def _clear_log(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        """只清空当前视图，历史事件仍可通过“查询历史”检索"""
+        with self._log_lock:
+            self._log_filters = {"min_id": self.event_log.last_id()}
+            self._log_total = 0
+        self._log_follow = True
+        self._log_dirty = True
         self._log("日志已清空")
 
-    def _log(self, msg, is_error=False):
-        if not self.root.winfo_exists() or self.stop_event.is_set():
+    def _apply_log_filter(self):
+        filters = {}
+        for key in ("level", "task_type"):
+            value = self.log_filter_vars[key].get()
+            if value and value != "全部":
+                filters[key] = value
+        date = self.log_filter_vars["date"].get().strip()
+        if date:
+            try:
+                datetime.datetime.strptime(date, "%Y-%m-%d")
+                filters["date"] = date
+            except ValueError:
+                messagebox.showwarning("日期格式错误", "日期格式应为YYYY-MM-DD")
+                return
+        keyword = self.log_filter_vars["keyword"].get().strip()
+        if keyword:
+            filters["keyword"] = keyword
+        with self._log_lock:
+            self._log_filters = filters
+            self._log_total = self.event_log.count(**filters)
+        self._log_follow = True
+        self._log_dirty = True
+
+    def _log(self, msg, is_error=False, task_type="系统"):
+        """事件写入SQLite（可在任意线程调用），界面由主线程的_poll_log按需刷新"""
+        if self.stop_event.is_set():
             return
-        self.log_text.config(state=tk.NORMAL)
         msg_str = safe_str(msg, "未知日志")
-        self.log_text.insert(tk.END, msg_str + "\n", "error" if is_error else "")
-        
-        # 限制日志行数
-        config = load_config()
-        max_lines = int(safe_str(config.get("LOG", "log_max_lines", fallback=100), 100))
-        config = None
-        current_lines = int(self.log_text.count('1.0', tk.END, "lines")[0])
-        
-        if current_lines > max_lines:
-            delete_end = f"{current_lines - max_lines}.0"
-            self.log_text.delete('1.0', delete_end)
-        
-        self.log_text.see(tk.END)
+        level = "错误" if is_error or "[错误]" in msg_str else "信息"
+        event_id = self.event_log.append(msg_str, level=level, task_type=task_type)
+        event = (event_id, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), level, task_type, msg_str)
+        with self._log_lock:
+            if EventLog.matches(event, **self._log_filters):
+                self._log_total += 1
+                self._log_dirty = True
+
+    def _poll_log(self):
+        if self.stop_event.is_set() or not self.root.winfo_exists():
+            return
+        if self._log_dirty:
+            self._log_dirty = False
+            self._render_log()
+        self.root.after(200, self._poll_log)
+
+    def _on_log_resize(self, event):
+        line_height = max(1, tkfont.Font(font=self.log_text["font"]).metrics("linespace"))
+        self._log_rows = max(1, event.height // line_height)
+        self._log_dirty = True
+
+    def _on_log_scroll(self, action, value, unit=None):
+        max_offset = max(0, self._log_total - self._log_rows)
+        if action == "moveto":
+            offset = int(float(value) * self._log_total)
+        else:
+            step = self._log_rows if unit == "pages" else 1
+            offset = self._log_offset + int(value) * step
+        self._log_offset = min(max(0, offset), max_offset)
+        self._log_follow = self._log_offset >= max_offset
+        self._log_dirty = True
+
+    def _render_log(self):
+        if self._log_follow:
+            self._log_offset = max(0, self._log_total - self._log_rows)
+        rows = self.event_log.page(self._log_offset, self._log_rows, total=self._log_total, **self._log_filters)
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.delete('1.0', tk.END)
+        for _, _, level, _, message in rows:
+            self.log_text.insert(tk.END, message + "\n", "error" if level == "错误" else "")
         self.log_text.config(state=tk.DISABLED)
+        if self._log_total:
+            self.log_scroll.set(self._log_offset / self._log_total,
+                                min(1.0, (self._log_offset + self._log_rows) / self._log_total))
+        else:
+            self.log_scroll.set(0, 1)
+        self.log_count_var.set(f"共{self._log_total}条")
 
     def close(self):
-        """强制终止进程，确保无残留"""
+        """强制终止进程，确保无残留；先等待正在进行的缓冲写入完成（最多5秒）"""
         self.stop_event.set()
+        if _PUBLISHER is not None:
+            _PUBLISHER.stop()
+        if _SPOOL is not None:
+            _SPOOL.lock.acquire(timeout=5)
         os._exit(0)
 
 
 # ------------------------------
 # 主程序入口
 # ------------------------------
+def preload_heavy_modules():
+    """首帧绘制后在后台预加载重量级模块，避免首次抓取时再等待导入"""
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"预加载{name}失败：{safe_str(e)}")
+    # 还没有最新状态快照（首次运行/刚升级）时，用data/中最新的xlsx建立
+    try:
+        config = load_config()
+        get_latest_state(config).seed(DATA_DIR, safe_str(config.get("CRAWLER", "file_prefix", fallback="辐射监测数据")))
+    except Exception as e:
+        print(f"建立最新状态失败：{safe_str(e)}")
+
+
 def main():
+    multiprocessing.freeze_support()  # 打包后导出任务的子进程入口
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        from export import cli as export_cli
+        sys.exit(export_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "crawl":
+        # 无界面抓取一次（供计划任务调用），与同时运行的界面通过作业协调器合并/排队
+        load_config()
+        result = fetch_data_task(callback=print, task_type="定时")
+        publisher = _PUBLISHER
+        if publisher is not None and not publisher.wait_idle(timeout=CONFIG.getint("JOBS", "wait_timeout", fallback=600)):
+            print("发布未在wait_timeout内完成，待发布项留在缓冲中由下次运行重试")
+            sys.exit(2)
+        if publisher is not None:
+            publisher.stop()
+        sys.exit(0 if result.get("ok") else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == "stations":
+        from geo import cli as stations_cli
+        sys.exit(stations_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "quality":
+        from quality import cli as quality_cli
+        sys.exit(quality_cli(sys.argv[2:]))
+
+    profile = "--profile-startup" in sys.argv
+    timer = StageTimer(_STARTUP_T0)
+    timer.mark("模块导入")
     load_config()
+    timer.mark("读取配置")
     root = tk.Tk()
+    timer.mark("创建窗口")
     app = CrawlerUI(root)
+    timer.mark("构建界面")
     root.protocol("WM_DELETE_WINDOW", app.close)
+
+    def on_first_paint():
+        timer.mark("首帧绘制")
+        app._log(f"启动耗时：{(timer.stages[-1][1] - timer.start) * 1000:.0f} ms")
+        if profile:
+            print(timer.report())
+            # 打包后的程序无法再以 -X importtime 启动解释器，只输出阶段计时
+            if not getattr(sys, "frozen", False):
+                total, rows = importtime_summary("main")
+                print(f"\nimport main 共 {total:.1f} ms，耗时最多的直接依赖：")
+                for name, cost in rows:
+                    print(f"  {name:<24} {cost:8.1f} ms")
+            sys.stdout.flush()
+            app.close()
+        threading.Thread(target=preload_heavy_modules, daemon=True).start()
+
+    root.after_idle(on_first_paint)
     root.mainloop()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,48 @@
+"""
+启动性能分析（python main.py --profile-startup）：
+- 阶段计时：进程内从导入到首帧绘制的各阶段耗时
+- -X importtime 汇总：子进程导入main，列出耗时最多的直接依赖
+"""
+import re
+import sys
+import time
+import subprocess
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)")
+
+
+class StageTimer:
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = []
+
+    def mark(self, name):
+        self.stages.append((name, time.perf_counter()))
+
+    def report(self):
+        lines, last = [], self.start
+        for name, stamp in self.stages:
+            lines.append(f"{name:<12} +{(stamp - last) * 1000:8.1f} ms  累计 {(stamp - self.start) * 1000:8.1f} ms")
+            last = stamp
+        return "\n".join(lines)
+
+
+def importtime_summary(module="main", top=10, python=None):
+    """返回 (总耗时ms, [(模块, 累计ms), ...])，只统计module直接导入的模块"""
+    result = subprocess.run([python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    total, rows, pending = 0.0, [], []
+    # 输出为后序：子模块先于父模块打印，遇到顶层的module时，之前收集的同层条目就是它的直接依赖
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if depth == 1:
+            if name == module:
+                total, rows = cumulative, pending
+            pending = []
+        elif depth == 3:
+            pending.append((name, cumulative))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return total, rows[:top]
@@ -0,0 +1,173 @@
+"""
+Git发布布局（[GIT] layout）：
+- main：xlsx直接提交到main分支（原有方式，仓库随抓取次数持续膨胀）
+- data_branch：快照提交到独立的孤儿分支，用git底层命令写入，不检出、不影响工作区；
+  同时提交按月的CSV/JSONL增量文件。分支提交数达到compact_every后压缩为一个根提交并强制推送，
+  压缩时目录树只保留最近keep_snapshots个xlsx，更早的数据由增量文件保存
+- text：每次抓取追加写入按月分片的CSV/JSONL增量文件，git可对文本做delta压缩；
+  xlsx可选通过Git LFS提交
+"""
+import os
+import csv
+import json
+import datetime
+import subprocess
+from pathlib import Path
+
+TEXT_FIELDS = ["采集时间", "省份", "监测点", "辐射值", "更新时间", "来源"]
+
+
+def run_git(args, repo_dir=None, env=None):
+    return subprocess.run(['git'] + list(args), cwd=repo_dir, env=env, capture_output=True, text=True)
+
+
+def _log(log, msg):
+    if log and callable(log):
+        log(msg)
+
+
+def _has_crawl(path, fmt, stamp):
+    """增量文件中是否已有该采集时间的记录（发布重试时避免重复追加）"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if fmt == "jsonl":
+                for line in f:
+                    try:
+                        if json.loads(line).get("采集时间") == stamp:
+                            return True
+                    except ValueError:
+                        continue
+                return False
+            return any(row.get("采集时间") == stamp for row in csv.DictReader(f))
+    except FileNotFoundError:
+        return False
+
+
+def append_text_delta(records, text_dir, fmt="csv", crawl_time=None):
+    """把本次抓取追加到 text_dir/YYYY-MM.csv|jsonl，返回文件路径；只追加不改写，便于git做delta。
+    以采集时间区分批次，同一采集时间已写入过则不再追加"""
+    crawl_time = crawl_time or datetime.datetime.now()
+    text_dir = Path(text_dir)
+    text_dir.mkdir(parents=True, exist_ok=True)
+    stamp = crawl_time.strftime('%Y-%m-%d %H:%M:%S')
+    path = text_dir / f"{crawl_time.strftime('%Y-%m')}.{'jsonl' if fmt == 'jsonl' else 'csv'}"
+    if _has_crawl(path, fmt, stamp):
+        return path
+    rows = [dict({k: r.get(k, "") for k in TEXT_FIELDS[1:]}, 采集时间=stamp) for r in records or []]
+
+    if fmt == "jsonl":
+        with open(path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    else:
+        is_new = not path.exists()
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=TEXT_FIELDS)
+            if is_new:
+                writer.writeheader()
+            writer.writerows(rows)
+    return path
+
+
+def ensure_lfs(patterns, repo_dir=None, log=None):
+    """启用Git LFS并跟踪给定模式，未安装git-lfs或安装过滤器失败时返回False"""
+    if run_git(['lfs', 'version'], repo_dir).returncode != 0:
+        _log(log, "未安装git-lfs，二进制快照不提交")
+        return False
+    # 在本仓库配置clean/smudge过滤器，否则track后xlsx仍按普通blob完整提交
+    result = run_git(['lfs', 'install', '--local'], repo_dir)
+    if result.returncode != 0:
+        _log(log, f"LFS过滤器安装失败，二进制快照不提交：{result.stderr.strip()}")
+        return False
+    for pattern in patterns:
+        result = run_git(['lfs', 'track', pattern], repo_dir)
+        if result.returncode != 0:
+            _log(log, f"LFS跟踪失败：{result.stderr.strip()}")
+            return False
+    return True
+
+
+def publish_files(paths, message, repo_dir=None, branch="main", remote="origin", log=None):
+    """add + commit + push 指定文件（main布局、text布局共用）"""
+    for path in paths:
+        _log(log, f"添加文件：{os.path.basename(str(path))}")
+        result = run_git(['add', str(path)], repo_dir)
+        if result.returncode != 0:
+            _log(log, f"add错误：{result.stderr.strip()}")
+            return False
+
+    # 上次提交成功但推送失败时，重试时暂存区为空：跳过提交，直接推送已有的本地提交
+    if run_git(['diff', '--cached', '--quiet'], repo_dir).returncode == 0:
+        _log(log, "无新内容可提交，推送已有提交")
+    else:
+        _log(log, f"提交：{message}")
+        result = run_git(['commit', '-m', message], repo_dir)
+        if result.returncode != 0:
+            _log(log, f"commit失败：{result.stderr.strip()}")
+            return False
+
+    result = run_git(['push', remote, branch], repo_dir)
+    if result.returncode != 0:
+        _log(log, f"push错误：{result.stderr.strip()}")
+        return False
+    return True
+
+
+def _stage_file(path, tree_path, repo_dir, env):
+    blob = run_git(['hash-object', '-w', str(path)], repo_dir).stdout.strip()
+    return run_git(['update-index', '--add', '--cacheinfo', f"100644,{blob},{tree_path}"], repo_dir, env)
+
+
+def publish_data_branch(file_path, message, repo_dir=None, branch="data", remote="origin",
+                        compact_every=30, keep_snapshots=7, text_file=None, log=None):
+    """把快照（及增量文件text_file）写入孤儿数据分支：临时索引 + hash-object/commit-tree/update-ref，不切换工作区分支"""
+    git_dir = run_git(['rev-parse', '--absolute-git-dir'], repo_dir).stdout.strip()
+    if not git_dir:
+        _log(log, "未找到Git目录")
+        return False
+    env = dict(os.environ, GIT_INDEX_FILE=os.path.join(git_dir, "publish-index"))
+    ref = f"refs/heads/{branch}"
+
+    parent = run_git(['rev-parse', '--verify', '-q', ref], repo_dir).stdout.strip()
+    result = run_git(['read-tree', parent] if parent else ['read-tree', '--empty'], repo_dir, env)
+    if result.returncode != 0:
+        _log(log, f"读取数据分支失败：{result.stderr.strip()}")
+        return False
+
+    files = [(file_path, f"data/{os.path.basename(str(file_path))}")]
+    if text_file:
+        files.append((text_file, f"history/{os.path.basename(str(text_file))}"))
+    for path, tree_path in files:
+        result = _stage_file(path, tree_path, repo_dir, env)
+        if result.returncode != 0:
+            _log(log, f"写入索引失败：{result.stderr.strip()}")
+            return False
+
+    # 提交数达到阈值时压缩：生成新的根提交，旧提交不再被引用；
+    # 目录树中只留最近keep_snapshots个xlsx（文件名含采集时间，按名称排序即按时间），否则旧快照仍在新树中，压缩几乎不省空间
+    compact = False
+    if parent:
+        count = run_git(['rev-list', '--count', parent], repo_dir).stdout.strip()
+        compact = count.isdigit() and int(count) >= compact_every
+    if compact and keep_snapshots > 0:
+        snapshots = sorted(p for p in run_git(['ls-files', '-z', 'data/'], repo_dir, env).stdout.split("\0")
+                           if p.endswith(".xlsx"))
+        for old in snapshots[:-keep_snapshots]:
+            run_git(['update-index', '--force-remove', old], repo_dir, env)
+    tree = run_git(['write-tree'], repo_dir, env).stdout.strip()
+    args = ['commit-tree', tree, '-m', message]
+    if parent and not compact:
+        args += ['-p', parent]
+    commit = run_git(args, repo_dir).stdout.strip()
+    if not commit:
+        _log(log, "生成提交失败")
+        return False
+    run_git(['update-ref', ref, commit], repo_dir)
+    _log(log, f"提交至{branch}分支：{message}{'（已压缩历史）' if compact else ''}")
+
+    refspec = f"{'+' if compact else ''}{ref}:{ref}"
+    result = run_git(['push', remote, refspec], repo_dir)
+    if result.returncode != 0:
+        _log(log, f"push错误：{result.stderr.strip()}")
+        return False
+    return True
@@ -0,0 +1,227 @@
+"""
+数据质量校验：整批记录一次性做格式与范围检查（pandas向量化，耗时随记录数线性增长），
+不合格的行转入隔离表，每次运行的质量指标写入 runs 表，都在同一个SQLite文件中。
+
+检查项（即隔离原因）：
+- 名称缺失    监测点为空或解析时填入的占位值
+- 数值无效    辐射值中没有数字（含“数值缺失”）
+- 剂量为负
+- 单位不符    单位不在允许列表中（μ/µ/u 视为相同）
+- 时间无效    更新时间无法解析为日期（含“时间缺失”）
+- 时间超前    更新日期晚于今天
+- 未知监测点  不在已知监测点表中（未提供时不检查）
+- 重复监测点  同一批次中同名监测点的第二条及以后（只在其余检查都通过的行之间判断）
+列入 warn_only 的检查只计入指标，不隔离。
+
+    python quality.py runs
+    python quality.py quarantine --run 12
+"""
+import csv
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+from pathlib import Path
+
+from history import DOSE_PATTERN
+
+RULES = ["名称缺失", "数值无效", "剂量为负", "单位不符", "时间无效", "时间超前", "未知监测点", "重复监测点"]
+PLACEHOLDERS = ["", "名称缺失", "数值缺失", "时间缺失", "未知", "None", "nan"]
+DEFAULT_UNITS = ["nGy/h", "μGy/h", "nSv/h", "μSv/h"]
+NUMBER_RE = rf"^\s*{DOSE_PATTERN}"
+
+
+def normalise_unit(unit):
+    """微的写法统一为μ，大小写不敏感；可传入字符串或pandas序列"""
+    if isinstance(unit, str):
+        unit = unit.strip().replace("µ", "μ")
+        return ("μ" + unit[1:] if unit[:1] in ("u", "U") else unit).lower()
+    unit = unit.str.strip().str.replace("µ", "μ", regex=False).str.replace(r"^[uU]", "μ", regex=True)
+    return unit.str.lower()
+
+
+def load_station_names(path):
+    """已知监测点：坐标表（stations.csv）中的监测点列"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return {(row.get("监测点") or "").strip() for row in csv.DictReader(f)} - {""}
+
+
+def validate(records, known_stations=None, units=DEFAULT_UNITS, warn_only=(), today=None):
+    """校验一批记录，返回 (通过的记录, 隔离的记录（附“原因”列）, 指标)"""
+    import numpy as np
+    import pandas as pd
+
+    start = time.perf_counter()
+    today = today or datetime.date.today()
+    records = list(records or [])
+    # 只取校验用到的三列，比由整条记录构造DataFrame快一个数量级
+    names = [str(r.get("监测点") or "").strip() for r in records]
+    name = pd.Series(names, dtype=object).astype(str)
+    value = pd.Series([str(r.get("辐射值") or "") for r in records], dtype=object).astype(str)
+    matched = value.str.match(NUMBER_RE)
+    dose = value.str.replace(NUMBER_RE + r".*$", r"\1", regex=True).where(matched).astype(float)
+    unit = value.str.replace(NUMBER_RE + r"\s*", "", regex=True)
+    updated = pd.Series([str(r.get("更新时间") or "").strip()[:10] for r in records], dtype=object).astype(str)
+    updated = pd.to_datetime(updated, format="%Y-%m-%d", errors="coerce")
+
+    checks = {
+        "名称缺失": name.isin(PLACEHOLDERS).to_numpy(bool),
+        "数值无效": dose.isna().to_numpy(bool),
+        "剂量为负": (dose < 0).to_numpy(bool),
+        "单位不符": (dose.notna() & ~normalise_unit(unit).isin([normalise_unit(u) for u in units])).to_numpy(bool),
+        "时间无效": updated.isna().to_numpy(bool),
+        "时间超前": (updated > pd.Timestamp(today)).to_numpy(bool),
+    }
+    if known_stations:
+        # 已知表可能很大，Series.isin每次都要为它重建哈希表；直接查集合，耗时只与本批行数有关
+        known = np.fromiter((n in known_stations for n in names), dtype=bool, count=len(names))
+        checks["未知监测点"] = ~checks["名称缺失"] & ~known
+    bad = np.zeros(len(records), dtype=bool)
+    for rule, mask in checks.items():
+        if rule not in warn_only:
+            bad |= mask
+    # 重复只在其余检查都通过的行之间判断，坏行不会挤掉后面的好行
+    checks["重复监测点"] = ~bad & name.where(~bad).duplicated(keep="first").to_numpy(bool)
+    if "重复监测点" not in warn_only:
+        bad |= checks["重复监测点"]
+
+    passed = [records[i] for i in np.flatnonzero(~bad)]
+    quarantined = []
+    if bad.any():
+        matrix = np.column_stack(list(checks.values()))
+        rules = list(checks)
+        for i in np.flatnonzero(bad):
+            reasons = "；".join(rule for rule, hit in zip(rules, matrix[i]) if hit)
+            quarantined.append(dict(records[i], 原因=reasons))
+
+    counts = {rule: int(mask.sum()) for rule, mask in checks.items()}
+    metrics = {
+        "total": len(records),
+        "passed": len(passed),
+        "quarantined": len(quarantined),
+        "pass_rate": len(passed) / len(records) if records else 1.0,
+        "rules": {rule: count for rule, count in counts.items() if count},
+        "ms": (time.perf_counter() - start) * 1000,
+    }
+    return passed, quarantined, metrics
+
+
+class QualityStore:
+    """隔离表与运行指标（SQLite）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                passed INTEGER NOT NULL,
+                quarantined INTEGER NOT NULL,
+                rules TEXT NOT NULL,
+                ms REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS quarantine (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL,
+                source TEXT,
+                province TEXT,
+                station TEXT,
+                value TEXT,
+                updated TEXT,
+                reasons TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_quarantine_run ON quarantine(run_id);
+            CREATE INDEX IF NOT EXISTS idx_quarantine_station ON quarantine(station, id);
+        """)
+        self._conn.commit()
+
+    def record(self, metrics, quarantined, task_type="定时"):
+        """写入一次运行的指标及其隔离记录，返回运行id"""
+        ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(str(r.get("来源") or ""), str(r.get("省份") or ""), str(r.get("监测点") or ""),
+                 str(r.get("辐射值") or ""), str(r.get("更新时间") or ""), r["原因"]) for r in quarantined]
+        with self._lock, self._conn:
+            run_id = self._conn.execute(
+                "INSERT INTO runs (ts, task_type, total, passed, quarantined, rules, ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ts, task_type, metrics["total"], metrics["passed"], metrics["quarantined"],
+                 json.dumps(metrics["rules"], ensure_ascii=False), round(metrics["ms"], 3))).lastrowid
+            self._conn.executemany(
+                "INSERT INTO quarantine (run_id, source, province, station, value, updated, reasons) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id,) + row for row in rows])
+        return run_id
+
+    def runs(self, limit=20):
+        """最近的运行指标（最新在前）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row, rules=json.loads(row["rules"])) for row in rows]
+
+    def quarantined(self, run_id=None, limit=100):
+        """隔离记录（最新在前）；指定run_id时只取该次运行"""
+        sql, params = "SELECT * FROM quarantine", []
+        if run_id is not None:
+            sql, params = sql + " WHERE run_id = ?", [run_id]
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QualityGate:
+    """抓取流程中的校验环节：校验、落库、返回通过的记录"""
+
+    def __init__(self, db_path, known_stations=None, units=DEFAULT_UNITS, warn_only=()):
+        self.store = QualityStore(db_path)
+        self.known_stations = set(known_stations or ())
+        self.units = list(units)
+        self.warn_only = set(warn_only)
+
+    def check(self, records, task_type="定时"):
+        """返回 (通过的记录, 指标)，指标中带本次运行id"""
+        passed, quarantined, metrics = validate(records, self.known_stations, self.units, self.warn_only)
+        metrics["run_id"] = self.store.record(metrics, quarantined, task_type)
+        return passed, metrics
+
+
+def describe(metrics):
+    """一行摘要：通过30/31，隔离1（剂量为负1）"""
+    rules = "、".join(f"{rule}{count}" for rule, count in metrics["rules"].items())
+    return (f"通过{metrics['passed']}/{metrics['total']}，隔离{metrics['quarantined']}"
+            f"{f'（{rules}）' if rules else ''}，耗时{metrics['ms']:.1f}ms")
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog="quality", description="数据质量指标与隔离记录")
+    parser.add_argument("command", choices=["runs", "quarantine"])
+    parser.add_argument("--db", default="state/quality.db")
+    parser.add_argument("--run", type=int, help="只显示该次运行的隔离记录")
+    parser.add_argument("-n", type=int, default=20, help="显示条数")
+    args = parser.parse_args(argv)
+
+    store = QualityStore(args.db)
+    if args.command == "runs":
+        for run in store.runs(args.n):
+            print(f"#{run['id']:<6} {run['ts']}  {run['task_type']}  {describe(run)}")
+    else:
+        for row in store.quarantined(args.run, args.n):
+            print(f"#{row['run_id']:<6} {row['station']:<24} {row['value']:<12} {row['updated']:<12} {row['reasons']}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,197 @@
+"""
+本地预写缓冲（spool）：
+- 解析出的每批数据先以原子方式（临时文件 + fsync + rename）写入 spool/batches/
+- 待发布操作记入追加式日志 spool/journal.jsonl（enqueue/done），启动时重放未完成项
+- 后台发布线程按顺序处理待发布项，失败后指数退避重试，不阻塞抓取
+"""
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+
+ORPHAN_AGE = 600
+
+
+def atomic_write(path, data):
+    """写入同目录临时文件并fsync后rename，读者只会看到完整的旧文件或新文件"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def file_stamp(path):
+    """文件的 (修改时间, 大小)，不存在时为None；用于发现其他进程写入了状态文件"""
+    try:
+        stat = Path(path).stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class Spool:
+    def __init__(self, spool_dir, guard=None):
+        self.dir = Path(spool_dir)
+        self.batch_dir = self.dir / "batches"
+        self.journal_path = self.dir / "journal.jsonl"
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()  # 关闭程序前获取，保证不会打断正在进行的写入
+        # 跨进程互斥（如作业协调器的租约）：多个进程共用同一缓冲目录时，避免压缩日志时丢失其他进程刚追加的项
+        self._guard = guard or nullcontext
+
+    def _append_journal(self, entry):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_batch(self, records, **meta):
+        """持久化一批解析结果，返回批次id"""
+        with self.lock:
+            batch_id = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            payload = {"id": batch_id, "meta": meta, "records": records}
+            atomic_write(self.batch_dir / f"{batch_id}.json", json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+            return batch_id
+
+    def read_batch(self, batch_id):
+        with open(self.batch_dir / f"{batch_id}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def enqueue(self, batch_id, **job):
+        with self.lock, self._guard():
+            self._append_journal(dict(job, op="enqueue", id=batch_id))
+
+    def mark_done(self, batch_id):
+        with self.lock, self._guard():
+            self._append_journal({"op": "done", "id": batch_id})
+            try:
+                (self.batch_dir / f"{batch_id}.json").unlink()
+            except FileNotFoundError:
+                pass
+
+    def pending(self):
+        """按入队顺序返回未完成的发布项；日志末尾的半行（写入时被中断）忽略"""
+        with self.lock:
+            jobs = {}
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if entry.get("op") == "enqueue":
+                            jobs[entry["id"]] = entry
+                        elif entry.get("op") == "done":
+                            jobs.pop(entry.get("id"), None)
+            except FileNotFoundError:
+                pass
+            return list(jobs.values())
+
+    def compact(self):
+        """重写日志只保留未完成项，并清理孤立的批次文件（最近写入的可能属于其他进程尚未入队的批次，暂不清理）"""
+        with self.lock, self._guard():
+            jobs = self.pending()
+            data = "".join(json.dumps(job, ensure_ascii=False) + "\n" for job in jobs)
+            atomic_write(self.journal_path, data.encode('utf-8'))
+            keep = {job["id"] for job in jobs}
+            cutoff = time.time() - ORPHAN_AGE
+            for path in self.batch_dir.glob("*.json"):
+                if path.stem not in keep and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            return len(jobs)
+
+
+class Publisher:
+    """后台发布线程：publish_func(job, batch) 返回True即完成，否则按 base_delay*2^n（不超过max_delay）重试"""
+
+    def __init__(self, spool, publish_func, log=None, base_delay=30, max_delay=3600):
+        self.spool = spool
+        self.publish_func = publish_func
+        self.log = log
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()  # 未在处理队列时置位：publish_func已返回、租约已释放、日志已压缩
+        self._idle.set()
+        self._thread = None
+        self.failures = 0
+
+    def _log(self, msg, is_error=False):
+        if self.log and callable(self.log):
+            self.log(f"[发布] {msg}", is_error=is_error)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """有新的发布项入队时唤醒（退避等待中也会立即重试）"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            self._idle.clear()
+            try:
+                ok, jobs = self._process()
+            finally:
+                self._idle.set()
+            if ok is None:
+                return
+            if ok:
+                self._wake.wait()
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** self.failures)
+                self.failures += 1
+                self._log(f"{len(jobs)}项待发布，{delay:.0f}秒后重试", is_error=True)
+                self._wake.wait(delay)
+
+    def _process(self):
+        """依次发布待发布项，返回 (是否全部完成（停止时为None）, 待发布项)"""
+        jobs = self.spool.pending()
+        ok = True
+        for job in jobs:
+            if self._stop.is_set():
+                return None, jobs
+            try:
+                batch = self.spool.read_batch(job["id"])
+            except FileNotFoundError:
+                batch = None
+            try:
+                ok = bool(self.publish_func(job, batch))
+            except Exception as e:
+                self._log(f"发布{job['id']}异常：{str(e)[:100]}", is_error=True)
+                ok = False
+            if not ok:
+                break
+            self.spool.mark_done(job["id"])
+        if ok:
+            self.failures = 0
+            if jobs:
+                self.spool.compact()
+        return ok, jobs
+
+    def wait_idle(self, timeout=None):
+        """等待队列清空且发布线程空闲（供脚本/基准测试使用），返回是否已清空。
+        publish_func可能在持有租约时就标记完成，只看队列会在租约释放前返回"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.spool.pending() or not self._idle.is_set():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
@@ -0,0 +1,501 @@
+"""
+剂量时间序列存储：按监测点分块压缩，供历史曲线等查询使用（与 history.HistoryStore 接口相同）。
+
+目录结构：
+- stations.json  监测点id -> 名称/省份
+- times.bin      时间线：全部采集时间（同一次抓取的各监测点共用），delta-of-delta编码
+- chunks.bin     只追加的压缩数据块，读取时内存映射
+- index.npy      数据块索引（监测点id、起止时间序号、偏移、长度、点数、编码方式）
+- head.bin       尚未封块的最新数据点（定长记录，追加写入）
+
+每个数据块（默认512点）内：
+- 采集时间：在时间线中的序号，存delta-of-delta（每次抓取都有该站数据时全为0）
+- 剂量：能按10^k放大为整数时存差分（nGy/h读数变化缓慢），否则存与前值的XOR（Gorilla）
+- 更新日期：距1970-01-01天数的差分
+三列均经zigzag后以varint编码（numpy整批完成），再整块zlib压缩。
+按时间查询时，先在时间线上二分得到序号范围，再在该监测点的块索引上二分，只解码相关的块。
+
+    python tsstore.py import --data-dir data      从xlsx快照导入（只导入比已有数据新的快照）
+    python tsstore.py stats
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+import datetime
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+from history import DOSE_PATTERN, HISTORY_COLUMNS, list_snapshots, read_snapshot, snapshot_time
+
+CHUNK_POINTS = 512
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+DOSE_RE = re.compile(DOSE_PATTERN)
+STORE_FILES = ("stations.json", "times.bin", "index.npy", "head.bin", "chunks.bin")
+HEAD_DTYPE = np.dtype([("sid", "<i4"), ("ti", "<i4"), ("v", "<f8"), ("day", "<i4")])
+INDEX_DTYPE = np.dtype([("sid", "<i4"), ("ti0", "<i4"), ("ti1", "<i4"), ("offset", "<i8"), ("length", "<i4"),
+                        ("count", "<i4"), ("mode", "u1"), ("scale", "<i4")])
+MODE_DELTA, MODE_XOR = 0, 1
+NO_DAY = -1
+
+
+# ------------------------------
+# 编码
+# ------------------------------
+def zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def varint_encode(values):
+    """无符号整数数组 -> LEB128字节串（每字节7位，最高位表示后面还有字节）"""
+    values = np.asarray(values, dtype=np.uint64)
+    shifts = np.arange(10, dtype=np.uint64) * np.uint64(7)
+    shifted = values[:, None] >> shifts
+    groups = shifted & np.uint64(0x7f)
+    nbytes = np.maximum(1, (shifted > 0).sum(axis=1))
+    cont = np.arange(10) < (nbytes - 1)[:, None]
+    out = (groups.astype(np.uint8) | (cont.astype(np.uint8) << 7))
+    return out[np.arange(10) < nbytes[:, None]].tobytes()
+
+
+def varint_decode(data):
+    """LEB128字节串 -> 无符号整数数组"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7f).astype(np.uint64) << (position.astype(np.uint64) * np.uint64(7))
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+def _value_scale(values):
+    """最小的10^k（k<=3）使全部值放大后为整数，没有则返回None"""
+    for k in range(4):
+        scaled = values * 10 ** k
+        if np.all(np.abs(scaled - np.round(scaled)) < 1e-6) and np.all(np.abs(scaled) < 2 ** 52):
+            return 10 ** k
+    return None
+
+
+def delta_of_delta(values):
+    """[首值, 首个差值, 二阶差分...]"""
+    values = np.asarray(values, dtype=np.int64)
+    return np.concatenate([values[:1], values[1:2] - values[:1], np.diff(values, n=2)])
+
+
+def undo_delta_of_delta(dod):
+    return np.concatenate([dod[:1], dod[:1] + np.cumsum(np.cumsum(dod[1:]))])
+
+
+def encode_chunk(t, v, day):
+    """t为整数时间（序号），返回 (字节串, 编码方式, 放大倍数)"""
+    dod = delta_of_delta(t)
+    scale = _value_scale(v)
+    if scale is not None:
+        mode = MODE_DELTA
+        ints = np.round(v * scale).astype(np.int64)
+        values = zigzag(np.diff(ints, prepend=0))
+    else:
+        mode, scale = MODE_XOR, 0
+        bits = np.asarray(v, dtype="<f8").view(np.uint64)
+        # 相近浮点数的XOR低位多为0，字节反转后变成小整数，varint更短
+        values = (bits ^ np.concatenate([[np.uint64(0)], bits[:-1]])).byteswap()
+    days = zigzag(np.diff(np.asarray(day, dtype=np.int64), prepend=0))
+    return zlib.compress(varint_encode(np.concatenate([zigzag(dod), values, days])), 9), mode, scale
+
+
+def decode_chunk(data, count, mode, scale):
+    """返回 (整数时间, 剂量, 更新日期天数)"""
+    raw = varint_decode(zlib.decompress(data))
+    dod, values, days = raw[:count], raw[count:2 * count], raw[2 * count:3 * count]
+    t = undo_delta_of_delta(unzigzag(dod))
+    if mode == MODE_DELTA:
+        v = np.cumsum(unzigzag(values)) / scale
+    else:
+        v = np.bitwise_xor.accumulate(values.byteswap()).view("<f8")
+    return t, v.astype(np.float64), np.cumsum(unzigzag(days))
+
+
+# ------------------------------
+# 存储
+# ------------------------------
+def to_seconds(stamp):
+    return int((stamp - EPOCH).total_seconds())
+
+
+def _day_number(value):
+    try:
+        return (datetime.datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date() - EPOCH_DATE).days
+    except ValueError:
+        return NO_DAY
+
+
+def _atomic_save(path, writer):
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        writer(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class TimeSeriesStore:
+    """按监测点分块压缩的剂量序列；提供与HistoryStore相同的 refresh/frame/names/series 查询接口。
+    指定data_dir时，refresh()会先导入比已有数据新的xlsx快照。"""
+
+    def __init__(self, path, data_dir=None, file_prefix="辐射监测数据", chunk_points=CHUNK_POINTS,
+                 guard=None, cache_size=64):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.file_prefix = file_prefix
+        self.chunk_points = chunk_points
+        self.cache_size = cache_size
+        self._guard = guard or nullcontext  # 跨进程互斥（作业协调器租约）
+        self._lock = threading.RLock()
+        self._series_cache = OrderedDict()
+        self._stamp = None
+        self._mmap = None
+        self._backfilled = data_dir is None
+        self._load()
+
+    # ---- 文件读写 ----
+    def _file(self, name):
+        return self.path / name
+
+    def _size(self, name):
+        path = self._file(name)
+        return path.stat().st_size if path.exists() else 0
+
+    def _file_stamp(self):
+        stamp = []
+        for name in STORE_FILES:
+            try:
+                st = self._file(name).stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load(self):
+        try:
+            with open(self._file("stations.json"), 'r', encoding='utf-8') as f:
+                self.stations = json.load(f)
+        except FileNotFoundError:
+            self.stations = []
+        self._ids = {s["监测点"]: i for i, s in enumerate(self.stations)}
+        try:
+            with open(self._file("times.bin"), 'rb') as f:
+                self.times = undo_delta_of_delta(unzigzag(varint_decode(zlib.decompress(f.read()))))
+        except FileNotFoundError:
+            self.times = np.empty(0, dtype=np.int64)
+        try:
+            self.index = np.load(self._file("index.npy"))
+        except FileNotFoundError:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+        # 末尾不完整的记录（写入时被中断）忽略
+        count = self._size("head.bin") // HEAD_DTYPE.itemsize
+        self.head = (np.fromfile(self._file("head.bin"), dtype=HEAD_DTYPE, count=count) if count
+                     else np.empty(0, dtype=HEAD_DTYPE))
+        self._build_lookup()
+        # 封块后、重写head前中断时，head中会残留已入块的点
+        self.head = self.head[self.head["ti"] > self._last[self.head["sid"]]]
+        self._track_head()
+        self._mmap = None
+        self._stamp = self._file_stamp()
+        self._series_cache.clear()
+
+    def _build_lookup(self):
+        """按 (监测点, 起始序号) 排序的块索引，每个监测点对应其中一段，按时间二分查找"""
+        self._order = np.lexsort((self.index["ti0"], self.index["sid"]))
+        sids = self.index["sid"][self._order]
+        self._bounds = np.searchsorted(sids, np.arange(len(self.stations) + 1))
+        self._last = np.full(len(self.stations), -1, dtype=np.int64)  # 各监测点最新数据点的时间序号
+        np.maximum.at(self._last, self.index["sid"], self.index["ti1"])
+
+    def _track_head(self):
+        np.maximum.at(self._last, self.head["sid"], self.head["ti"])
+
+    def _chunks(self):
+        size = self._size("chunks.bin")
+        if self._mmap is None or len(self._mmap) < size:
+            self._mmap = np.memmap(self._file("chunks.bin"), dtype=np.uint8, mode='r') if size else np.empty(0, np.uint8)
+        return self._mmap
+
+    def _save_stations(self):
+        data = json.dumps(self.stations, ensure_ascii=False).encode('utf-8')
+        _atomic_save(self._file("stations.json"), lambda f: f.write(data))
+
+    def _save_times(self):
+        data = zlib.compress(varint_encode(zigzag(delta_of_delta(self.times))), 9)
+        _atomic_save(self._file("times.bin"), lambda f: f.write(data))
+
+    # ---- 写入 ----
+    def backfill(self, log=None):
+        """指定了data_dir时，本进程第一次写入前导入已有快照（时间线只能追加，晚了就无法再补入更早的快照）；
+        返回导入的快照数，已导入过时返回0。应在保存本次抓取的快照之前调用，否则本次快照也会被当作历史导入"""
+        if self._backfilled:
+            return 0
+        self._backfilled = True
+        return self.import_snapshots(log=log)
+
+    def append(self, records, crawl_time):
+        """追加一次抓取的记录（辐射值/剂量、更新时间），返回写入的点数。
+        采集时间须不早于已有的最新采集时间，否则忽略；同一监测点同一时间只保留一个点。
+        尚未回填时先回填（见backfill）。"""
+        # 在取得租约之前导入：导入本身也经由append写入，租约不可重入
+        self.backfill()
+        t = to_seconds(crawl_time)
+        with self._lock, self._guard():
+            if self._file_stamp() != self._stamp:
+                self._load()
+            if len(self.times) and t < self.times[-1]:
+                return 0
+            rows, new_station = {}, False
+            for record in records or []:
+                name = str(record.get("监测点") or "")
+                dose = record.get("剂量")
+                if dose is None or dose != dose:
+                    match = DOSE_RE.search(str(record.get("辐射值") or ""))
+                    dose = float(match.group(1)) if match else None
+                if not name or dose is None:
+                    continue
+                sid = self._ids.get(name)
+                if sid is None:
+                    sid = self._ids[name] = len(self.stations)
+                    self.stations.append({"监测点": name, "省份": str(record.get("省份") or "省份未知")})
+                    new_station = True
+                rows[sid] = (float(dose), _day_number(record.get("更新时间")))
+            if not rows:
+                return 0
+            # 先落盘监测点表和时间线，再写引用它们的数据点
+            if new_station:
+                self._save_stations()
+                self._last = np.concatenate([self._last, np.full(len(self.stations) - len(self._last), -1)])
+                self._bounds = np.concatenate([self._bounds, np.full(len(self.stations) + 1 - len(self._bounds),
+                                                                     self._bounds[-1])])
+            if not len(self.times) or t > self.times[-1]:
+                self.times = np.append(self.times, np.int64(t))
+                self._save_times()
+            ti = len(self.times) - 1
+            batch = np.array([(sid, ti, dose, day) for sid, (dose, day) in sorted(rows.items())], dtype=HEAD_DTYPE)
+            batch = batch[self._last[batch["sid"]] < ti]
+            if len(batch):
+                with open(self._file("head.bin"), 'ab') as f:
+                    f.write(batch.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.head = np.concatenate([self.head, batch])
+                self._last[batch["sid"]] = ti
+                self._seal()
+            self._stamp = self._file_stamp()
+            self._series_cache.clear()
+            return len(batch)
+
+    def _seal(self, force=False):
+        """把head中满chunk_points个点的监测点编码成块；force时全部封块"""
+        if not len(self.head):
+            return
+        head = self.head[np.lexsort((self.head["ti"], self.head["sid"]))]
+        sids, starts, counts = np.unique(head["sid"], return_index=True, return_counts=True)
+        blobs, rows, keep = [], [], []
+        offset = self._size("chunks.bin")
+        for sid, start, count in zip(sids.tolist(), starts.tolist(), counts.tolist()):
+            full = count if force else count // self.chunk_points * self.chunk_points
+            for i in range(start, start + full, self.chunk_points):
+                part = head[i:min(i + self.chunk_points, start + full)]
+                blob, mode, scale = encode_chunk(part["ti"], part["v"], part["day"])
+                rows.append((sid, part["ti"][0], part["ti"][-1], offset, len(blob), len(part), mode, scale))
+                blobs.append(blob)
+                offset += len(blob)
+            if full < count:
+                keep.append(head[start + full:start + count])
+        if not blobs:
+            return
+        # 顺序：数据块落盘 -> 索引替换 -> head重写；任一步中断都可在下次加载时恢复
+        with open(self._file("chunks.bin"), 'ab') as f:
+            f.write(b"".join(blobs))
+            f.flush()
+            os.fsync(f.fileno())
+        self.index = np.concatenate([self.index, np.array(rows, dtype=INDEX_DTYPE)])
+        _atomic_save(self._file("index.npy"), lambda f: np.save(f, self.index))
+        self.head = np.concatenate(keep) if keep else np.empty(0, dtype=HEAD_DTYPE)
+        _atomic_save(self._file("head.bin"), lambda f: f.write(self.head.tobytes()))
+        self._build_lookup()
+        self._track_head()
+
+    def flush(self):
+        """把head中剩余的点全部封块（导入结束时调用，使压缩率最大）"""
+        with self._lock, self._guard():
+            self._seal(force=True)
+            self._stamp = self._file_stamp()
+
+    def last_time(self):
+        """已存储的最晚采集时间，无数据时为None"""
+        with self._lock:
+            if not len(self.times):
+                return None
+            return EPOCH + datetime.timedelta(seconds=int(self.times[-1]))
+
+    def import_snapshots(self, data_dir=None, file_prefix=None, log=None):
+        """导入比已有数据新的xlsx快照，返回导入的快照数；早于已有数据且未导入过的快照无法补入，只提示"""
+        data_dir = Path(data_dir) if data_dir else self.data_dir
+        if data_dir is None:
+            return 0
+        latest = self.last_time()
+        if latest is not None:
+            with self._lock:
+                known = set(self.times.tolist())
+            missed = [path for path in list_snapshots(data_dir, file_prefix or self.file_prefix, None, latest)
+                      if to_seconds(snapshot_time(path)) not in known]
+            if missed:
+                print(f"有{len(missed)}个早于已存数据的快照未导入（时间线只能追加），"
+                      f"需要时删除{self.path}后重新导入")
+        start = latest + datetime.timedelta(seconds=1) if latest else None
+        imported = 0
+        for path in list_snapshots(data_dir, file_prefix or self.file_prefix, start):
+            try:
+                frame = read_snapshot(path)
+            except Exception as e:
+                print(f"读取快照失败：{path.name}（{e}）")
+                continue
+            self.append(frame.to_dict("records"), snapshot_time(path))
+            imported += 1
+            if log and imported % 100 == 0:
+                log(f"已导入{imported}个快照")
+        return imported
+
+    # ---- 查询 ----
+    def refresh(self):
+        """导入新快照并重新加载其他进程写入的数据，返回是否有变化"""
+        if self.data_dir is not None:
+            self.import_snapshots()
+        with self._lock:
+            if self._file_stamp() == self._stamp:
+                return False
+            self._load()
+            return True
+
+    def _station_points(self, sid, start=None, end=None):
+        """单个监测点 [start, end]（秒）内的 (采集时间秒数, 剂量, 更新日期)，只解码覆盖该范围的块"""
+        lo_ti = np.searchsorted(self.times, start, side="left") if start is not None else 0
+        hi_ti = np.searchsorted(self.times, end, side="right") - 1 if end is not None else len(self.times)
+        rows = self.index[self._order[self._bounds[sid]:self._bounds[sid + 1]]]
+        rows = rows[np.searchsorted(rows["ti1"], lo_ti, side="left"):]
+        rows = rows[:np.searchsorted(rows["ti0"], hi_ti, side="right")]
+        chunks = self._chunks()
+        parts = [decode_chunk(chunks[r["offset"]:r["offset"] + r["length"]], int(r["count"]), r["mode"], r["scale"])
+                 for r in rows]
+        head = self.head[self.head["sid"] == sid]
+        parts.append((head["ti"].astype(np.int64), head["v"], head["day"].astype(np.int64)))
+        ti, v, day = (np.concatenate(column) for column in zip(*parts))
+        mask = (ti >= lo_ti) & (ti <= hi_ti)
+        return self.times[ti[mask]], v[mask], day[mask]
+
+    def range(self, station, start=None, end=None):
+        """单个监测点时间范围内的 (采集时间秒数, 剂量, 更新日期天数)；start/end为datetime"""
+        with self._lock:
+            sid = self._ids.get(station)
+            if sid is None:
+                empty = np.empty(0, dtype=np.int64)
+                return empty, np.empty(0), empty
+            return self._station_points(sid, to_seconds(start) if start else None, to_seconds(end) if end else None)
+
+    def names(self, kind="监测点"):
+        with self._lock:
+            has_data = np.zeros(len(self.stations), dtype=bool)
+            has_data[self.index["sid"]] = True
+            has_data[self.head["sid"]] = True
+            return sorted({s[kind] for s, ok in zip(self.stations, has_data) if ok})
+
+    def series(self, kind, name):
+        """返回 (秒级时间戳数组, 剂量数组)，省份序列为同一采集时间内各站均值"""
+        key = (kind, name)
+        with self._lock:
+            if key in self._series_cache:
+                self._series_cache.move_to_end(key)
+                return self._series_cache[key]
+            sids = [i for i, s in enumerate(self.stations) if s[kind] == name]
+            parts = [self._station_points(sid)[:2] for sid in sids]
+            if parts:
+                t, v = (np.concatenate(column) for column in zip(*parts))
+            else:
+                t, v = np.empty(0, dtype=np.int64), np.empty(0)
+            x, inverse = np.unique(t, return_inverse=True)
+            y = np.bincount(inverse, weights=v, minlength=len(x)) / np.bincount(inverse, minlength=len(x))
+            self._series_cache[key] = (x, y)
+            while len(self._series_cache) > self.cache_size:
+                self._series_cache.popitem(last=False)
+            return x, y
+
+    def frame(self, start=None, end=None):
+        """全部（或时间范围内的）数据还原为HISTORY_COLUMNS长表；辐射值按“剂量 nGy/h”重建"""
+        import pandas as pd
+
+        columns = {c: [] for c in HISTORY_COLUMNS}
+        with self._lock:
+            for sid, station in enumerate(self.stations):
+                t, v, day = self._station_points(sid, to_seconds(start) if start else None,
+                                                 to_seconds(end) if end else None)
+                columns["采集时间"].append(t)
+                columns["剂量"].append(v)
+                columns["更新时间"].append(day)
+                columns["省份"].append(np.full(len(t), station["省份"], dtype=object))
+                columns["监测点"].append(np.full(len(t), station["监测点"], dtype=object))
+        if not columns["采集时间"]:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        t, v, day = (np.concatenate(columns[c]) for c in ("采集时间", "剂量", "更新时间"))
+        frame = pd.DataFrame({
+            "采集时间": pd.to_datetime(t, unit="s"),
+            "省份": np.concatenate(columns["省份"]),
+            "监测点": np.concatenate(columns["监测点"]),
+            "辐射值": [f"{value:g} nGy/h" for value in v],
+            "剂量": v,
+            "更新时间": np.where(day == NO_DAY, "时间缺失",
+                             pd.to_datetime(day, unit="D").strftime("%Y-%m-%d").to_numpy()),
+        })
+        return frame.sort_values(["采集时间", "省份"], kind="stable", ignore_index=True)
+
+    def stats(self):
+        with self._lock:
+            points = int(self.index["count"].sum()) + len(self.head)
+            return {"stations": len(self.stations), "chunks": len(self.index), "points": points,
+                    "times": len(self.times), "bytes": sum(self._size(name) for name in STORE_FILES)}
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog="tsstore", description="剂量时间序列存储")
+    parser.add_argument("command", choices=["import", "stats"])
+    parser.add_argument("--store", default="state/tsstore")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--prefix", default="辐射监测数据", help="快照文件名前缀（config.ini中的file_prefix）")
+    args = parser.parse_args(argv)
+
+    store = TimeSeriesStore(args.store)
+    if args.command == "import":
+        count = store.import_snapshots(args.data_dir, args.prefix, log=print)
+        store.flush()
+        print(f"导入{count}个快照")
+    stats = store.stats()
+    print(f"{stats['stations']}个监测点 {stats['points']}个数据点 {stats['chunks']}个数据块  "
+          f"共{stats['bytes'] / 1024:.1f} KB（{stats['bytes'] / max(1, stats['points']):.2f} 字节/点）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())